@@ -1,35 +1,55 @@
 import asyncio
 from dataclasses import dataclass, field
-from typing import Any, Dict, Optional, Callable
+from typing import Any, Dict, List, Optional, Callable
 
 from loguru import logger
 
 from common.event_bus import EventBus, Event
+from common.privacy.consent import ConsentCache, consent_store
 
 JsonDict = Dict[str, Any]
 
 
-@dataclass
+@dataclass(slots=True)
 class AgentConfig:
     name: str
     version: str = "1.0.0"
     description: Optional[str] = None
     subscribe_topics: list[str] = field(default_factory=list)
     publish_topic: Optional[str] = None
+    # >1 switches to micro-batched delivery through handle_batch
+    batch_size: int = 1
+
+
+# Consent invalidations must reach every agent instance, not one member of a consumer group
+CONSENT_TOPIC = "consent.changed"
 
 
 class BaseAgent:
+    # Memoized consent decisions; subscribe to CONSENT_TOPIC to pick up other replicas' changes
+    CONSENT_CACHE_TTL_SECONDS = 60.0
+    CONSENT_CACHE_SIZE = 10_000
+
     def __init__(self, config: AgentConfig, bus: EventBus):
         self.config = config
         self.bus = bus
         self._running = False
         self._state: Dict[str, Any] = {}
         self._ready_event = asyncio.Event()
+        self._consent_cache = ConsentCache(consent_store, ttl_seconds=self.CONSENT_CACHE_TTL_SECONDS,
+                                           maxsize=self.CONSENT_CACHE_SIZE)
 
     async def start(self) -> None:
         logger.info(f"Starting agent {self.config.name} v{self.config.version}")
-        for topic in self.config.subscribe_topics:
-            await self.bus.subscribe(topic, self._handle_event)
+        # Subscriptions are independent broker round-trips; issue them concurrently
+        async with asyncio.TaskGroup() as tg:
+            for topic in self.config.subscribe_topics:
+                if topic == CONSENT_TOPIC:
+                    tg.create_task(self.bus.subscribe(topic, self._handle_event, broadcast=True))
+                elif self.config.batch_size > 1:
+                    tg.create_task(self.bus.subscribe_batch(topic, self._handle_events, max_records=self.config.batch_size))
+                else:
+                    tg.create_task(self.bus.subscribe(topic, self._handle_event))
         self._running = True
         self._ready_event.set()
 
@@ -40,18 +60,54 @@ class BaseAgent:
     async def ready(self) -> None:
         await self._ready_event.wait()
 
+    async def _admit(self, event_dict: JsonDict) -> Optional[Event]:
+        """Wrap an inbound event dict, or return None if consent guards block it."""
+        if not self._fast_consent_guard(event_dict):
+            logger.warning(f"{self.config.name} consent guard blocked event correlation_id={event_dict.get('correlation_id')}")
+            return None
+        event = Event.view(event_dict)
+        logger.debug("{} received event type={} topic={}", self.config.name, event.type, event.topic)
+        if not await self._consent_guard(event):
+            logger.warning(f"{self.config.name} consent guard blocked event correlation_id={event.correlation_id}")
+            return None
+        return event
+
     async def _handle_event(self, event_dict: JsonDict) -> None:
+        if event_dict.get("topic") == CONSENT_TOPIC:
+            self._on_consent_changed(event_dict)
+            return
         try:
-            event = Event(**event_dict)
-            logger.debug(f"{self.config.name} received event type={event.type} topic={event.topic}")
-            if not await self._consent_guard(event):
-                logger.warning(f"{self.config.name} consent guard blocked event correlation_id={event.correlation_id}")
-                return
-            await self.handle(event)
+            event = await self._admit(event_dict)
+            if event is not None:
+                await self.handle(event)
         except Exception as e:
             logger.exception(f"Agent {self.config.name} error: {e}")
             await self.on_error(e, event_dict)
 
+    async def _handle_events(self, event_dicts: List[JsonDict]) -> None:
+        events = []
+        for event_dict in event_dicts:
+            try:
+                event = await self._admit(event_dict)
+            except Exception as e:
+                logger.exception(f"Agent {self.config.name} error: {e}")
+                await self.on_error(e, event_dict)
+                continue
+            if event is not None:
+                events.append(event)
+        if events:
+            await self.handle_batch(events)
+
+    async def handle_batch(self, events: List[Event]) -> None:
+        # Default: per-event handling with per-event error isolation; override to
+        # process a micro-batch as a unit.
+        for event in events:
+            try:
+                await self.handle(event)
+            except Exception as e:
+                logger.exception(f"Agent {self.config.name} error: {e}")
+                await self.on_error(e, event.as_dict())
+
     async def handle(self, event: Event) -> None:
         raise NotImplementedError
 
@@ -69,6 +125,21 @@ class BaseAgent:
     def set_state(self, key: str, value: Any) -> None:
         self._state[key] = value
 
+    def _check_consent(self, user_id: str, purpose: str) -> bool:
+        return self._consent_cache.check(user_id, purpose)
+
+    def _on_consent_changed(self, event_dict: JsonDict) -> None:
+        # Drop cached consent decisions changed on another replica
+        payload = event_dict.get("payload") or {}
+        user_id = event_dict.get("user_id") or payload.get("user_id")
+        if user_id:
+            self._consent_cache.invalidate(user_id, payload.get("purpose"))
+
+    def _fast_consent_guard(self, event_dict: JsonDict) -> bool:
+        # Synchronous pre-check on the raw event dict, run before any event object is
+        # built. Agents whose consent decision is a cheap local lookup override this.
+        return True
+
     async def _consent_guard(self, event: Event) -> bool:
         # Overridden by agents that must enforce consent on inbound events.
         # Default to True to allow through.
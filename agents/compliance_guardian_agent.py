@@ -1,6 +1,6 @@
 import re
 from typing import Any, Dict, Optional
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from loguru import logger
 
 from agents.base import BaseAgent, AgentConfig
@@ -10,9 +10,13 @@ from common.privacy.audit import audit_event
 JsonDict = Dict[str, Any]
 
 
-@dataclass
+@dataclass(slots=True)
 class ComplianceConfig:
     prohibited_patterns: list[str] = None
+    # Lowercase substrings at least one of which every pattern match must contain;
+    # texts containing none of them skip the regex scan. None disables the prescreen.
+    prescreen_keywords: Optional[tuple[str, ...]] = None
+    _fused: Optional[re.Pattern] = field(default=None, init=False, repr=False, compare=False)
 
     def __post_init__(self):
         if self.prohibited_patterns is None:
@@ -22,6 +26,13 @@ class ComplianceConfig:
                 r"\bcure(s|d|ing)?\b",
                 r"\bprevent\b (?:disease|illness)"
             ]
+            if self.prescreen_keywords is None:
+                self.prescreen_keywords = ("diagnos", "treat", "cure", "prevent")
+        # One alternation with a named group per pattern scans the text once
+        self._fused = re.compile(
+            "|".join(f"(?P<p{i}>{p})" for i, p in enumerate(self.prohibited_patterns)),
+            re.IGNORECASE
+        )
 
 
 class ComplianceGuardianAgent(BaseAgent):
@@ -31,35 +42,56 @@ class ComplianceGuardianAgent(BaseAgent):
             subscribe_topics=["protocol.generated"]
         ), bus)
         self.compliance_config = ComplianceConfig()
+        self._soften_re = re.compile(r"\b(treat|cure|prevent)\b", re.IGNORECASE)
+        self._disclaimer = "This content is for general wellness only and is not medical advice."
+        self._disclaimer_lower = self._disclaimer.lower()
+        self._disclaimer_marker = "not medical advice"
+        self._dispatch = {
+            "protocol.generated": self._handle_protocol_generated,
+        }
 
     async def handle(self, event: Event) -> None:
-        if event.topic == "protocol.generated":
-            text = event.payload.get("protocol", "")
-            issues = self._scan(text)
-            if issues:
-                audit_event("compliance.flagged", user_id=event.user_id, details={"issues": issues}, correlation_id=event.correlation_id)
-                # Force-append disclaimer and soften language
-                fixed = self._soften_language(text)
-                await self.publish(
-                    topic="protocol.generated",
-                    event_type="protocol.generated.sanitized",
-                    payload={"user_id": event.user_id, "protocol": fixed},
-                    user_id=event.user_id,
-                    correlation_id=event.correlation_id
-                )
+        handler = self._dispatch.get(event.topic)
+        if handler:
+            await handler(event)
 
-    def _scan(self, text: str) -> list[str]:
-        hits = []
-        for pat in self.compliance_config.prohibited_patterns:
-            if re.search(pat, text, flags=re.IGNORECASE):
-                hits.append(pat)
-        if "not medical advice" not in text.lower():
+    async def _handle_protocol_generated(self, event: Event) -> None:
+        text = event.payload.get("protocol", "")
+        lowered = text.lower()
+        issues = self._scan(text, lowered)
+        if issues:
+            audit_event("compliance.flagged", user_id=event.user_id, details={"issues": issues}, correlation_id=event.correlation_id)
+            # Force-append disclaimer and soften language
+            fixed = self._soften_language(text, lowered)
+            await self.publish(
+                topic="protocol.generated",
+                event_type="protocol.generated.sanitized",
+                payload={"user_id": event.user_id, "protocol": fixed},
+                user_id=event.user_id,
+                correlation_id=event.correlation_id
+            )
+
+    def _scan(self, text: str, lowered: Optional[str] = None) -> list[str]:
+        config = self.compliance_config
+        if lowered is None:
+            lowered = text.lower()
+        keywords = config.prescreen_keywords
+        if keywords is not None and not any(k in lowered for k in keywords):
+            # Clean text: plain substring search rules out every pattern
+            hits = []
+        else:
+            matched = {int(m.lastgroup[1:]) for m in config._fused.finditer(text)}
+            hits = [config.prohibited_patterns[i] for i in sorted(matched)]
+        if self._disclaimer_marker not in lowered:
             hits.append("missing_disclaimer")
         return hits
 
-    def _soften_language(self, text: str) -> str:
-        text = re.sub(r"\b(treat|cure|prevent)\b", "may support", text, flags=re.IGNORECASE)
-        disclaimer = "This content is for general wellness only and is not medical advice."
-        if disclaimer.lower() not in text.lower():
-            text += f"\n\n{disclaimer}"
+    def _soften_language(self, text: str, lowered: Optional[str] = None) -> str:
+        # Softening never touches the disclaimer wording, so the pre-substitution
+        # lowercase text is still valid for the containment check below.
+        if lowered is None:
+            lowered = text.lower()
+        text = self._soften_re.sub("may support", text)
+        if self._disclaimer_lower not in lowered:
+            text += f"\n\n{self._disclaimer}"
         return text
\ No newline at end of file
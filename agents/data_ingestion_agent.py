@@ -1,15 +1,77 @@
+import asyncio
+import sys
+import time
+from functools import lru_cache
+from operator import attrgetter
 from typing import Any, Dict, List, Optional
-from datetime import datetime
+from datetime import datetime, timezone
+import orjson
 from loguru import logger
 
 from agents.base import BaseAgent, AgentConfig
 from common.event_bus import Event
-from common.persistence.timeseries_client import TimeseriesClient
-from common.privacy.consent import consent_store
+from common.models.fhir_mapper import wearables_to_fhir_observations
+from common.persistence.timeseries_client import Measurement, TimeseriesClient, to_epoch_micros
 from common.privacy.audit import audit_event
 
 JsonDict = Dict[str, Any]
 
+# Shared read-only fallback for missing nested FHIR objects; never mutated
+_EMPTY: JsonDict = {}
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+@lru_cache(maxsize=4096)
+def _meta_json(source: str, **fields: Any) -> str:
+    """Serialized jsonb meta; rows in a batch share a handful of distinct field combinations."""
+    return orjson.dumps({"source": source, **fields}, default=str).decode()
+
+
+def _standardize_raw_points(raw_data: List[Any]) -> List[JsonDict]:
+    """
+    Map raw provider points to {metric, value, timestamp, unit} records.
+
+    Bursts can carry tens of thousands of points, so the loop keeps lookups in
+    locals and skips the per-point isinstance check for the common all-dict case.
+    """
+    out: List[JsonDict] = []
+    append = out.append
+    for point in raw_data:
+        try:
+            get = point.get
+        except AttributeError:
+            continue
+        value = get("value")
+        if value is None:
+            continue
+        timestamp = get("timestamp") or get("ts")
+        if not timestamp:
+            continue
+        append({
+            "metric": get("type") or get("metric") or "unknown",
+            "value": value,
+            "timestamp": timestamp,
+            "unit": get("unit", "")
+        })
+    return out
+
+
+def _dedupe(measurements: List[Measurement]) -> List[Measurement]:
+    """Drop repeated (user_id, metric, ts) points, e.g. from retried or overlapping syncs; first wins."""
+    seen = set()
+    out: List[Measurement] = []
+    for m in measurements:
+        key = (m.user_id, m.metric, m.ts)
+        if key not in seen:
+            seen.add(key)
+            out.append(m)
+    if len(out) < len(measurements):
+        logger.debug("Dropped {} duplicate measurements", len(measurements) - len(out))
+    return out
+
 
 class DataIngestionAgent(BaseAgent):
     """
@@ -18,6 +80,13 @@ class DataIngestionAgent(BaseAgent):
     Listens for standardized data events and persists measurements to TimescaleDB
     for time-series analysis and retrieval.
     """
+
+    FLUSH_MAX_ROWS = 2000  # Flush once this many rows are queued
+    FLUSH_INTERVAL_SECONDS = 0.05  # ...or this long after the first queued row
+    RATE_LOG_INTERVAL_SECONDS = 1.0  # Aggregate persisted-row logging to one line per interval
+    WRITE_ATTEMPTS = 4  # COPY attempts per bucket before its events are failed to on_error
+    WRITE_BACKOFF_SECONDS = 0.2  # Doubled after every failed attempt
+    CONSENT_CACHE_SIZE = 100_000
     
     def __init__(self, bus):
         super().__init__(AgentConfig(
@@ -27,34 +96,79 @@ class DataIngestionAgent(BaseAgent):
                 "ingest.wearables.standardized",
                 "ingest.labs.raw",
                 "ingest.labs.standardized",
-                "ingest.questionnaire.standardized"
-            ]
+                "ingest.questionnaire.standardized",
+                "consent.changed"
+            ],
+            batch_size=64
         ), bus)
         self.ts = TimeseriesClient()
-        self._batch_size = 100  # Process in batches for efficiency
+        self._pending: asyncio.Queue = asyncio.Queue()
+        self._flusher: Optional[asyncio.Task] = None
+        self._rate_rows = 0
+        self._rate_started = time.monotonic()
+        self._dispatch = {
+            "ingest.wearables.standardized": self._handle_wearables_data,
+            "ingest.labs.standardized": self._handle_labs_data,
+            "ingest.questionnaire.standardized": self._handle_questionnaire_data,
+            "ingest.wearables.raw": self._handle_raw_wearables,
+            "ingest.labs.raw": self._handle_raw_labs,
+        }
+
+    async def start(self) -> None:
+        await super().start()
+        self._flusher = asyncio.create_task(self._flush_loop())
 
-    async def _consent_guard(self, event: Event) -> bool:
-        """Check if user has consented to data processing."""
-        if not event.user_id:
+    async def stop(self) -> None:
+        await super().stop()
+        if self._flusher:
+            # Sentinel makes the flusher persist whatever is still queued, then exit
+            self._pending.put_nowait(None)
+            await self._flusher
+            self._flusher = None
+            self._log_ingest_rate(force=True)
+
+    def _fast_consent_guard(self, event_dict: JsonDict) -> bool:
+        """Check if user has consented to data processing, straight from the raw event dict."""
+        user_id = event_dict.get("user_id")
+        if not user_id:
             return True
-        return consent_store.check(event.user_id, "data_processing")
+        return self._check_consent(user_id, "data_processing")
 
     async def handle(self, event: Event) -> None:
         """Process incoming data events and persist to storage."""
+        handler = self._dispatch.get(event.topic)
+        if handler is None:
+            return
         try:
-            if event.topic == "ingest.wearables.standardized":
-                await self._handle_wearables_data(event)
-            elif event.topic == "ingest.labs.standardized":
-                await self._handle_labs_data(event)
-            elif event.topic == "ingest.questionnaire.standardized":
-                await self._handle_questionnaire_data(event)
-            elif event.topic == "ingest.wearables.raw":
-                await self._handle_raw_wearables(event)
-            elif event.topic == "ingest.labs.raw":
-                await self._handle_raw_labs(event)
+            await handler(event)
         except Exception as e:
             logger.error(f"Error processing event in {self.config.name}: {e}")
-            await self.on_error(e, event.payload)
+            await self.on_error(e, event.as_dict())
+
+    async def handle_batch(self, events: List[Event]) -> None:
+        # Handle the micro-batch concurrently so every event's rows land in the same
+        # flush; returning only once they are persisted keeps the offset commit behind it
+        results = await asyncio.gather(*[self.handle(event) for event in events], return_exceptions=True)
+        for event, result in zip(events, results):
+            if isinstance(result, Exception):
+                logger.opt(exception=result).error(f"Agent {self.config.name} error: {result}")
+                await self.on_error(result, event.as_dict())
+
+    async def on_error(self, error: Exception, event_dict: Optional[JsonDict] = None) -> None:
+        # Park the original event on the DLQ so it can be replayed once the store recovers
+        await super().on_error(error, event_dict)
+        if not event_dict:
+            return
+        try:
+            await self.publish(
+                "ingest.dlq",
+                "ingestion.failed",
+                {"event": event_dict, "error": str(error)},
+                event_dict.get("user_id"),
+                event_dict.get("correlation_id")
+            )
+        except Exception as e:
+            logger.error(f"Failed to dead-letter event correlation_id={event_dict.get('correlation_id')}: {e}")
 
     async def _handle_wearables_data(self, event: Event) -> None:
         """Extract and persist wearable measurements from standardized event."""
@@ -64,53 +178,44 @@ class DataIngestionAgent(BaseAgent):
             return
         
         data = event.payload.get("data", [])
-        provider = event.payload.get("provider", "unknown")
-        measurements = []
+        # Low-cardinality meta strings are interned so repeated rows share one object
+        provider = _intern(event.payload.get("provider", "unknown"))
+        measurements: List[Measurement] = []
         
         # Extract measurements from standardized FHIR observations
         for item in data:
             if isinstance(item, dict) and "fhir" in item:
                 fhir_obs = item["fhir"]
-                metric = fhir_obs.get("code", {}).get("text", "unknown")
-                ts = fhir_obs.get("effectiveDateTime")
-                value = fhir_obs.get("valueQuantity", {}).get("value")
+                quantity = fhir_obs.get("valueQuantity") or _EMPTY
+                value = quantity.get("value")
+                ts = to_epoch_micros(fhir_obs.get("effectiveDateTime"))
                 
-                if ts and value is not None:
-                    measurements.append({
-                        "user_id": user_id,
-                        "metric": metric,
-                        "ts": ts,
-                        "value": float(value),
-                        "meta": {
-                            "source": "wearables",
-                            "provider": provider,
-                            "unit": fhir_obs.get("valueQuantity", {}).get("unit"),
-                            "device": fhir_obs.get("device", {}).get("display")
-                        }
-                    })
+                if ts is not None and value is not None:
+                    metric = (fhir_obs.get("code") or _EMPTY).get("text", "unknown")
+                    measurements.append(Measurement(
+                        user_id,
+                        metric,
+                        ts,
+                        float(value),
+                        _meta_json(
+                            "wearables",
+                            provider=provider,
+                            unit=quantity.get("unit"),
+                            device=(fhir_obs.get("device") or _EMPTY).get("display")
+                        )
+                    ))
         
-        # Persist measurements in batches
+        # Queue measurements for the coalescing flusher
         if measurements:
-            try:
-                for i in range(0, len(measurements), self._batch_size):
-                    batch = measurements[i:i + self._batch_size]
-                    count = self.ts.insert_measurements(batch)
-                    logger.info(f"Persisted {count} wearable measurements for user {user_id}")
-                
-                audit_event(
-                    "ingestion.wearables.persisted",
-                    user_id=user_id,
-                    details={
-                        "count": len(measurements),
-                        "provider": provider
-                    },
-                    correlation_id=event.correlation_id
-                )
-            except Exception as e:
-                logger.error(f"Failed to persist wearable data: {e}")
-                raise
+            await self._enqueue(
+                measurements,
+                "ingestion.wearables.persisted",
+                user_id,
+                {"provider": provider},
+                event.correlation_id
+            )
         else:
-            logger.debug(f"No measurements to persist from wearables event")
+            logger.debug("No measurements to persist from wearables event")
 
     async def _handle_labs_data(self, event: Event) -> None:
         """Extract and persist lab measurements from standardized event."""
@@ -122,61 +227,54 @@ class DataIngestionAgent(BaseAgent):
         # Labs data might come as FHIR observations or OMOP measurements
         fhir_data = event.payload.get("fhir")
         omop_data = event.payload.get("omop")
-        measurements = []
+        measurements: List[Measurement] = []
         
         if fhir_data:
             # Process FHIR observation
-            metric = fhir_data.get("code", {}).get("text", "unknown")
-            ts = fhir_data.get("effectiveDateTime")
-            value = fhir_data.get("valueQuantity", {}).get("value")
+            quantity = fhir_data.get("valueQuantity") or _EMPTY
+            value = quantity.get("value")
+            ts = to_epoch_micros(fhir_data.get("effectiveDateTime"))
             
-            if ts and value is not None:
-                measurements.append({
-                    "user_id": user_id,
-                    "metric": f"lab_{metric}",  # Prefix to distinguish from wearables
-                    "ts": ts,
-                    "value": float(value),
-                    "meta": {
-                        "source": "labs",
-                        "lab": fhir_data.get("performer", [{}])[0].get("display", "unknown"),
-                        "unit": fhir_data.get("valueQuantity", {}).get("unit")
-                    }
-                })
+            if ts is not None and value is not None:
+                metric = (fhir_data.get("code") or _EMPTY).get("text", "unknown")
+                try:
+                    lab = fhir_data["performer"][0].get("display", "unknown")
+                except (KeyError, IndexError, TypeError):
+                    lab = "unknown"
+                measurements.append(Measurement(
+                    user_id,
+                    f"lab_{metric}",  # Prefix to distinguish from wearables
+                    ts,
+                    float(value),
+                    _meta_json(
+                        "labs",
+                        lab=lab,
+                        unit=quantity.get("unit")
+                    )
+                ))
         
         if omop_data:
             # Process OMOP measurement
             metric = omop_data.get("measurement_source_value", "unknown")
-            ts = omop_data.get("measurement_datetime")
+            ts = to_epoch_micros(omop_data.get("measurement_datetime"))
             value = omop_data.get("value_as_number")
             
-            if ts and value is not None:
-                measurements.append({
-                    "user_id": user_id,
-                    "metric": f"lab_{metric}",
-                    "ts": ts,
-                    "value": float(value),
-                    "meta": {
-                        "source": "labs",
-                        "omop_concept_id": omop_data.get("measurement_concept_id"),
-                        "unit": omop_data.get("unit_source_value")
-                    }
-                })
+            if ts is not None and value is not None:
+                measurements.append(Measurement(
+                    user_id,
+                    f"lab_{metric}",
+                    ts,
+                    float(value),
+                    _meta_json(
+                        "labs",
+                        omop_concept_id=omop_data.get("measurement_concept_id"),
+                        unit=omop_data.get("unit_source_value")
+                    )
+                ))
         
-        # Persist measurements
+        # Queue measurements for the coalescing flusher
         if measurements:
-            try:
-                count = self.ts.insert_measurements(measurements)
-                logger.info(f"Persisted {count} lab measurements for user {user_id}")
-                
-                audit_event(
-                    "ingestion.labs.persisted",
-                    user_id=user_id,
-                    details={"count": len(measurements)},
-                    correlation_id=event.correlation_id
-                )
-            except Exception as e:
-                logger.error(f"Failed to persist lab data: {e}")
-                raise
+            await self._enqueue(measurements, "ingestion.labs.persisted", user_id, {}, event.correlation_id)
 
     async def _handle_questionnaire_data(self, event: Event) -> None:
         """Process and persist questionnaire responses as categorical data."""
@@ -189,46 +287,180 @@ class DataIngestionAgent(BaseAgent):
         fhir_response = event.payload.get("fhir", {})
         
         # Extract numeric answers as measurements
-        measurements = []
+        measurements: List[Measurement] = []
         items = fhir_response.get("item", [])
+        authored = to_epoch_micros(fhir_response.get("authored"))
+        if authored is None:
+            authored = to_epoch_micros(datetime.now(timezone.utc))
         
         for item in items:
             # Look for numeric answers that can be tracked as time-series
-            answer = item.get("answer", [{}])[0] if item.get("answer") else {}
+            answers = item.get("answer")
+            answer = answers[0] if answers else _EMPTY
             
             if "valueDecimal" in answer or "valueInteger" in answer:
                 value = answer.get("valueDecimal") or answer.get("valueInteger")
                 question_id = item.get("linkId", "unknown")
                 
-                measurements.append({
-                    "user_id": user_id,
-                    "metric": f"questionnaire_{questionnaire_id}_{question_id}",
-                    "ts": fhir_response.get("authored", datetime.utcnow().isoformat()),
-                    "value": float(value),
-                    "meta": {
-                        "source": "questionnaire",
-                        "questionnaire_id": questionnaire_id,
-                        "question": item.get("text", "")
-                    }
-                })
+                measurements.append(Measurement(
+                    user_id,
+                    f"questionnaire_{questionnaire_id}_{question_id}",
+                    authored,
+                    float(value),
+                    _meta_json(
+                        "questionnaire",
+                        questionnaire_id=questionnaire_id,
+                        question=item.get("text", "")
+                    )
+                ))
         
         if measurements:
+            await self._enqueue(
+                measurements,
+                "ingestion.questionnaire.persisted",
+                user_id,
+                {"questionnaire_id": questionnaire_id},
+                event.correlation_id
+            )
+
+    async def _enqueue(self, measurements: List[Measurement], action: str, user_id: str, details: JsonDict,
+                       correlation_id: Optional[str]) -> None:
+        """
+        Hand measurements to the flusher and wait until they are persisted.
+
+        The audit record is emitted by the flusher; a write that still fails after
+        retries is raised here so handle() routes the event to on_error.
+        """
+        done = asyncio.get_running_loop().create_future()
+        self._pending.put_nowait((measurements, (action, user_id, details, correlation_id), done))
+        await done
+
+    async def _flush_loop(self) -> None:
+        """
+        Coalesce queued measurements into large COPY batches.
+
+        A batch is flushed once it reaches FLUSH_MAX_ROWS or FLUSH_INTERVAL_SECONDS
+        after its first item arrived. A None sentinel drains and stops the loop.
+        """
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._pending.get()
+            if item is None:
+                break
+            batch = [item]
+            rows = len(item[0])
+            deadline = loop.time() + self.FLUSH_INTERVAL_SECONDS
+            while rows < self.FLUSH_MAX_ROWS:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._pending.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+                rows += len(item[0])
             try:
-                count = self.ts.insert_measurements(measurements)
-                logger.info(f"Persisted {count} questionnaire measurements for user {user_id}")
-                
-                audit_event(
-                    "ingestion.questionnaire.persisted",
-                    user_id=user_id,
-                    details={
-                        "questionnaire_id": questionnaire_id,
-                        "count": len(measurements)
-                    },
-                    correlation_id=event.correlation_id
-                )
+                await self._flush(batch)
             except Exception as e:
-                logger.error(f"Failed to persist questionnaire data: {e}")
-                raise
+                # Keep the flusher alive; the waiting handlers see the error and dead-letter
+                logger.exception(f"Measurement flush failed: {e}")
+                for *_, done in batch:
+                    if not done.done():
+                        done.set_exception(e)
+
+    async def _flush(self, batch: List[tuple]) -> None:
+        """Persist one coalesced batch, then emit per-user aggregated audit events."""
+        measurements: List[Measurement] = []
+        for rows, _, _ in batch:
+            measurements.extend(rows)
+        measurements = _dedupe(measurements)
+        count, failed = await self._write_partitioned(measurements)
+        logger.debug("Persisted {} measurements from {} events", count, len(batch))
+        self._rate_rows += count
+        self._log_ingest_rate()
+
+        audits: Dict[tuple, JsonDict] = {}
+        for rows, (action, user_id, details, correlation_id), done in batch:
+            error = failed.get(self._bucket_of(user_id))
+            if error is not None:
+                done.set_exception(error)
+                continue
+            done.set_result(None)
+            key = (action, user_id, tuple(sorted(details.items())))
+            agg = audits.get(key)
+            if agg is None:
+                agg = audits[key] = {"details": dict(details, count=0), "correlation_ids": []}
+            agg["details"]["count"] += len(rows)
+            if correlation_id:
+                agg["correlation_ids"].append(correlation_id)
+
+        for (action, user_id, _), agg in audits.items():
+            correlation_ids = agg["correlation_ids"]
+            details = agg["details"]
+            if len(correlation_ids) > 1:
+                details["correlation_ids"] = correlation_ids
+            audit_event(
+                action,
+                user_id=user_id,
+                details=details,
+                correlation_id=correlation_ids[0] if len(correlation_ids) == 1 else None
+            )
+
+    def _log_ingest_rate(self, force: bool = False) -> None:
+        """Emit one aggregate throughput line per interval instead of a line per batch."""
+        elapsed = time.monotonic() - self._rate_started
+        if not force and elapsed < self.RATE_LOG_INTERVAL_SECONDS:
+            return
+        if self._rate_rows:
+            logger.info("Persisted {} measurements in {:.1f}s ({:.0f}/s)",
+                        self._rate_rows, elapsed, self._rate_rows / max(elapsed, 1e-9))
+        self._rate_rows = 0
+        self._rate_started += elapsed
+
+    def _bucket_of(self, user_id: str) -> int:
+        return hash(user_id) % self.ts.pool_size
+
+    async def _write_partitioned(self, measurements: List[Measurement]) -> tuple[int, Dict[int, Exception]]:
+        """
+        Split a batch into one bucket per pooled connection and COPY them concurrently.
+
+        The batch is sorted by timestamp once up front; bucketing by user is stable, so
+        every bucket is written oldest-to-newest and lands in the hot hypertable chunk.
+        Each COPY is its own transaction, so only failed buckets are retried, with
+        exponential backoff. Returns the rows written and {bucket: error} for buckets
+        that still failed after WRITE_ATTEMPTS.
+        """
+        measurements.sort(key=attrgetter("ts"))
+        buckets: Dict[int, List[Measurement]] = {}
+        for m in measurements:
+            buckets.setdefault(self._bucket_of(m.user_id), []).append(m)
+        written = 0
+        failed: Dict[int, Exception] = {}
+        delay = self.WRITE_BACKOFF_SECONDS
+        for attempt in range(1, self.WRITE_ATTEMPTS + 1):
+            results = await asyncio.gather(*[
+                asyncio.to_thread(self.ts.copy_measurements, bucket) for bucket in buckets.values()
+            ], return_exceptions=True)
+            failed = {}
+            for idx, result in zip(list(buckets), results):
+                if isinstance(result, Exception):
+                    failed[idx] = result
+                else:
+                    written += result
+                    del buckets[idx]
+            if not failed:
+                break
+            logger.warning("COPY failed for {} of {} buckets (attempt {}/{}): {}", len(failed), len(results),
+                           attempt, self.WRITE_ATTEMPTS, next(iter(failed.values())))
+            if attempt < self.WRITE_ATTEMPTS:
+                await asyncio.sleep(delay)
+                delay *= 2
+        return written, failed
 
     async def _handle_raw_wearables(self, event: Event) -> None:
         """
@@ -245,24 +477,14 @@ class DataIngestionAgent(BaseAgent):
         provider = event.payload.get("provider", "unknown")
         
         # Standardize raw data (simplified example)
-        standardized = []
-        for point in raw_data:
-            if isinstance(point, dict):
-                # Attempt to extract common fields
-                metric = point.get("type") or point.get("metric") or "unknown"
-                value = point.get("value")
-                timestamp = point.get("timestamp") or point.get("ts")
-                
-                if value is not None and timestamp:
-                    standardized.append({
-                        "metric": metric,
-                        "value": value,
-                        "timestamp": timestamp,
-                        "unit": point.get("unit", "")
-                    })
+        standardized = _standardize_raw_points(raw_data)
         
         if standardized:
-            logger.debug(f"Standardized {len(standardized)} raw data points")
+            logger.debug("Standardized {} raw data points", len(standardized))
+            # Same {"fhir": Observation} items as provider-standardized events, mapped in one batch
+            observations = wearables_to_fhir_observations([
+                (user_id, p["metric"], p["timestamp"], p["value"], p["unit"], None) for p in standardized
+            ])
             
             # Publish standardized event for reprocessing
             await self.publish(
@@ -271,7 +493,7 @@ class DataIngestionAgent(BaseAgent):
                 payload={
                     "user_id": user_id,
                     "provider": provider,
-                    "data": standardized,
+                    "data": [{"fhir": obs} for obs in observations],
                     "meta": {"standardized_from_raw": True}
                 },
                 user_id=user_id,
@@ -289,7 +511,7 @@ class DataIngestionAgent(BaseAgent):
             logger.warning("No user_id in raw labs event")
             return
         
-        logger.debug(f"Received raw labs data for standardization")
+        logger.debug("Received raw labs data for standardization")
         
         # For raw labs, standardization would involve:
         # 1. Mapping lab codes to standard vocabularies (LOINC)
@@ -1,19 +1,56 @@
-from typing import Any, Dict, Optional, List
-from dataclasses import dataclass, field, asdict
+from typing import Any, Dict, Optional, List, Set
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 import asyncio
+import time
+from operator import itemgetter
+import numpy as np
+import orjson
+import pandas as pd
 from loguru import logger
 
 from agents.base import BaseAgent, AgentConfig
 from common.event_bus import Event
 from common.persistence.timeseries_client import TimeseriesClient
-from common.privacy.consent import consent_store
-from common.privacy.audit import audit_event
+from common.privacy.audit import audit_async
 
 JsonDict = Dict[str, Any]
 
+_EPOCH = pd.Timestamp(0, tz="UTC")
 
-@dataclass
+# Wearable metric name -> (HealthMetrics attribute, lower bound, upper bound)
+_WEARABLE_METRICS = {
+    "hrv": ("hrv", 20.0, 100.0),
+    "heart_rate": ("resting_heart_rate", 40.0, 100.0),
+    "sleep_efficiency": ("sleep_efficiency", 0.0, 1.0),
+    "activity_minutes": ("activity_minutes", 0.0, 240.0),
+    "steps": ("steps_daily", 0.0, float("inf")),
+    "stress_score": ("stress_score", 0.0, 1.0),
+    "recovery_score": ("recovery_score", 0.0, 1.0),
+}
+
+# Metrics with 30-day trend indicators; names match both wearable metrics and stored series
+_TREND_METRICS = ("hrv", "sleep_efficiency", "activity_minutes", "stress_score")
+
+# Biological age bands per biomarker: (aliases, low, score below low, high, score above high).
+# Values inside [low, high] contribute nothing; negative scores mean younger.
+_BIOAGE_BANDS = (
+    (("crp", "c-reactive protein"), 1.0, -1.0, 3.0, 2.0),  # Inflammation: low is younger, high is older
+    (("hba1c", "a1c"), 5.4, -0.5, 5.7, 1.5),  # Metabolic health; above 5.7 is prediabetic range
+    (("vitamin d", "25-hydroxyvitamin d"), 20.0, 1.0, 40.0, -0.3),  # ng/ml; below 20 is deficient, above 40 optimal
+)
+
+
+def _series_arrays(data: List[JsonDict]) -> tuple[np.ndarray, np.ndarray]:
+    """Epoch seconds and values for query rows, dropping rows with unparseable ts or value."""
+    stamps = pd.to_datetime([d.get("ts") for d in data], utc=True, errors="coerce", format="ISO8601")
+    t_arr = (stamps - _EPOCH).total_seconds().to_numpy(dtype=np.float64)
+    v_arr = pd.to_numeric(pd.Series([d.get("value") for d in data], dtype=object), errors="coerce").to_numpy(dtype=np.float64)
+    finite = np.isfinite(t_arr) & np.isfinite(v_arr)
+    return t_arr[finite], v_arr[finite]
+
+
+@dataclass(slots=True)
 class HealthMetrics:
     """Standardized health metrics with defined bounds and units."""
     hrv: float = 35.0  # Heart rate variability in milliseconds (ms), range: 20-100
@@ -24,8 +61,20 @@ class HealthMetrics:
     stress_score: float = 0.3  # Stress level (0-1), lower is better
     recovery_score: float = 0.7  # Recovery score (0-1), higher is better
 
+    def to_dict(self) -> JsonDict:
+        # Hand-written equivalent of asdict(); no field reflection or deepcopy
+        return {
+            "hrv": self.hrv,
+            "resting_heart_rate": self.resting_heart_rate,
+            "sleep_efficiency": self.sleep_efficiency,
+            "activity_minutes": self.activity_minutes,
+            "steps_daily": self.steps_daily,
+            "stress_score": self.stress_score,
+            "recovery_score": self.recovery_score,
+        }
+
 
-@dataclass
+@dataclass(slots=True)
 class TwinState:
     """
     Digital twin state representing a user's health profile.
@@ -44,6 +93,28 @@ class TwinState:
     last_sync: Optional[str] = None
     version: int = 1
     last_persistence: Optional[str] = None
+    # Epoch seconds of the last scheduled persistence; 0.0 means not yet persisted by this process
+    last_persistence_epoch: float = field(default=0.0, repr=False, compare=False)
+    # Trend metrics with new readings since their trend was last computed; all start dirty
+    dirty_metrics: Set[str] = field(default_factory=lambda: set(_TREND_METRICS), repr=False, compare=False)
+    # Epoch seconds before which trends are not recomputed
+    trend_next_run: float = field(default=0.0, repr=False, compare=False)
+
+    def to_dict(self, metrics_dict: Optional[JsonDict] = None) -> JsonDict:
+        # metrics_dict lets callers reuse an already-built self.metrics.to_dict()
+        return {
+            "user_id": self.user_id,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "metrics": metrics_dict if metrics_dict is not None else self.metrics.to_dict(),
+            "vitality_score": self.vitality_score,
+            "biological_age_delta": self.biological_age_delta,
+            "trend_indicators": dict(self.trend_indicators),
+            "intervention_efficacy": dict(self.intervention_efficacy),
+            "last_sync": self.last_sync,
+            "version": self.version,
+            "last_persistence": self.last_persistence,
+        }
 
 
 class DigitalTwinAgent(BaseAgent):
@@ -64,6 +135,20 @@ class DigitalTwinAgent(BaseAgent):
         "stress": 0.10,  # Chronic stress impacts healthspan
         "rhr": 0.10   # Resting heart rate indicates fitness
     }
+    # Same weights as a vector, in the component order used by _calculate_vitality_score
+    _WEIGHTS = np.array(
+        itemgetter("hrv", "sleep_efficiency", "activity", "recovery", "stress", "rhr")(VITALITY_WEIGHTS),
+        dtype=np.float64
+    )
+    # Upper bound on twin snapshots written per insert
+    PERSIST_MAX_BATCH = 100
+    # Minimum spacing between trend recomputations for one twin
+    TREND_MIN_INTERVAL_SECONDS = 60.0
+    CONSENT_CACHE_SIZE = 8192
+    # In-memory twins kept; the least recently used is persisted and dropped beyond this
+    MAX_TWINS = 50_000
+    # Pause before the persistence worker retries after a failed write
+    PERSIST_RETRY_SECONDS = 5.0
     
     def __init__(self, bus):
         super().__init__(AgentConfig(
@@ -71,24 +156,49 @@ class DigitalTwinAgent(BaseAgent):
             subscribe_topics=[
                 "user.twin.update.requested",
                 "ingest.wearables.standardized",
-                "ingest.labs.standardized"
+                "ingest.labs.standardized",
+                "consent.changed"
             ]
         ), bus)
+        # Ordered by recency of use (dict insertion order); see _remember_twin
         self._twins: Dict[str, TwinState] = {}
+        # Evicted twins whose final snapshot isn't written yet; consulted before the database
+        self._evicted: Dict[str, TwinState] = {}
+        # In-flight first loads, so concurrent events for one uncached user share a single twin
+        self._loading: Dict[str, asyncio.Task] = {}
         self.ts = TimeseriesClient()
+        # Every timeseries call from this agent (trend queries, loads, persistence) shares
+        # the client's pool; cap in-flight calls at its size so concurrent handlers queue here
+        self._db_slots = asyncio.Semaphore(self.ts.pool_size)
         self._persistence_interval_seconds = 300  # Persist every 5 minutes
-        self._persistence_tasks: Dict[str, asyncio.Task] = {}
+        self._persist_queue: asyncio.Queue = asyncio.Queue()
+        self._persist_worker: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        await super().start()
+        self._persist_worker = asyncio.create_task(self._persist_loop())
+
+    async def stop(self) -> None:
+        await super().stop()
+        if self._persist_worker:
+            # Sentinel makes the worker persist whatever is still queued, then exit
+            self._persist_queue.put_nowait(None)
+            await self._persist_worker
+            self._persist_worker = None
 
     async def _consent_guard(self, event: Event) -> bool:
         """Check if user has consented to personalization."""
         if not event.user_id:
             return True
-        return consent_store.check(event.user_id, "personalization")
+        return self._check_consent(event.user_id, "personalization")
 
     async def handle(self, event: Event) -> None:
         """Process events and update digital twin state."""
+        # One clock read per event, shared by every timestamp written below
+        now_iso = datetime.utcnow().isoformat()
+        
         user_id = event.user_id or event.payload.get("user_id") or "unknown"
-        twin = await self._get_or_create_twin(user_id)
+        twin = await self._get_or_create_twin(user_id, now_iso)
         
         if event.topic == "ingest.wearables.standardized":
             await self._update_from_wearables(twin, event)
@@ -99,22 +209,21 @@ class DigitalTwinAgent(BaseAgent):
         
         # Update vitality score with evidence-based calculation
         self._calculate_vitality_score(twin)
+        # Metrics are final for this event; build their dict once for publish and persistence
+        metrics_dict = twin.metrics.to_dict()
         
         # Calculate trends from historical data
         await self._calculate_trends(twin)
         
         # Update timestamp and version
-        twin.updated_at = datetime.utcnow().isoformat()
+        twin.updated_at = now_iso
         twin.version += 1
         
-        # Store updated twin
-        self._twins[user_id] = twin
-        
         # Schedule persistence if needed
-        await self._schedule_persistence(twin)
+        await self._schedule_persistence(twin, now_iso, metrics_dict)
         
         # Audit and publish update
-        audit_event(
+        audit_async(
             "twin.updated",
             user_id=user_id,
             details={
@@ -131,7 +240,7 @@ class DigitalTwinAgent(BaseAgent):
                 "user_id": user_id,
                 "vitality_score": round(twin.vitality_score, 3),
                 "biological_age_delta": round(twin.biological_age_delta, 1),
-                "metrics": asdict(twin.metrics),
+                "metrics": metrics_dict,
                 "trends": twin.trend_indicators,
                 "version": twin.version
             },
@@ -139,31 +248,57 @@ class DigitalTwinAgent(BaseAgent):
             correlation_id=event.correlation_id
         )
 
-    async def _get_or_create_twin(self, user_id: str) -> TwinState:
+    async def _get_or_create_twin(self, user_id: str, now_iso: str) -> TwinState:
         """Get existing twin or create new one."""
-        if user_id in self._twins:
-            return self._twins[user_id]
-        
-        # Try to load from persistence
-        twin = await self._load_twin_state(user_id)
-        if twin:
+        twin = self._twins.pop(user_id, None)
+        if twin is not None:
+            # Re-insert to mark as most recently used
             self._twins[user_id] = twin
             return twin
         
-        # Create new twin
-        now = datetime.utcnow().isoformat()
-        twin = TwinState(
-            user_id=user_id,
-            created_at=now,
-            updated_at=now
-        )
-        self._twins[user_id] = twin
+        # Evicted but not yet persisted: the database copy is older than this one
+        twin = self._evicted.pop(user_id, None)
+        if twin is not None:
+            self._remember_twin(twin)
+            return twin
+        
+        # The load awaits the database; events arriving meanwhile wait on the same task
+        load = self._loading.get(user_id)
+        if load is None:
+            load = self._loading[user_id] = asyncio.create_task(self._load_or_create_twin(user_id, now_iso))
+            load.add_done_callback(lambda _: self._loading.pop(user_id, None))
+        # Shielded so one cancelled handler doesn't cancel the load for the others
+        return await asyncio.shield(load)
+
+    async def _load_or_create_twin(self, user_id: str, now_iso: str) -> TwinState:
+        # Try to load from persistence
+        twin = await self._load_twin_state(user_id)
+        if twin is None:
+            # Create new twin
+            twin = TwinState(
+                user_id=user_id,
+                created_at=now_iso,
+                updated_at=now_iso
+            )
+        self._remember_twin(twin)
         return twin
 
+    def _remember_twin(self, twin: TwinState) -> None:
+        """Cache a twin, persisting and dropping the least recently used one when full."""
+        self._twins[twin.user_id] = twin
+        if len(self._twins) > self.MAX_TWINS:
+            cold = self._twins.pop(next(iter(self._twins)))
+            # Held until its snapshot is written, so neither a failed write nor an early
+            # return of the user falls back to an older database copy
+            self._evicted[cold.user_id] = cold
+            self._queue_snapshot(cold, "evicted")
+
     async def _update_from_wearables(self, twin: TwinState, event: Event) -> None:
         """Update twin metrics from wearable data."""
         data = event.payload.get("data", [])
         
+        # Group readings per attribute first, then clamp each group in one pass
+        buckets: Dict[str, List[float]] = {}
         for item in data:
             if isinstance(item, dict) and "fhir" in item:
                 fhir_obs = item["fhir"]
@@ -173,21 +308,22 @@ class DigitalTwinAgent(BaseAgent):
                 if value is None:
                     continue
                 
-                # Update relevant metrics with bounds checking
-                if metric == "hrv":
-                    twin.metrics.hrv = max(20.0, min(100.0, float(value)))
-                elif metric == "heart_rate" and value < 100:  # Likely resting if <100
-                    twin.metrics.resting_heart_rate = max(40.0, min(100.0, float(value)))
-                elif metric == "sleep_efficiency":
-                    twin.metrics.sleep_efficiency = max(0.0, min(1.0, float(value)))
-                elif metric == "activity_minutes":
-                    twin.metrics.activity_minutes = max(0.0, min(240.0, float(value)))
-                elif metric == "steps":
-                    twin.metrics.steps_daily = max(0.0, float(value))
-                elif metric == "stress_score":
-                    twin.metrics.stress_score = max(0.0, min(1.0, float(value)))
-                elif metric == "recovery_score":
-                    twin.metrics.recovery_score = max(0.0, min(1.0, float(value)))
+                spec = _WEARABLE_METRICS.get(metric)
+                if spec is None:
+                    continue
+                attr = spec[0]
+                v = float(value)
+                if attr == "resting_heart_rate" and v >= 100.0:
+                    continue  # Only readings below 100 bpm are likely resting
+                buckets.setdefault(metric, []).append(v)
+        
+        # Update relevant metrics with bounds checking; the latest reading wins
+        metrics = twin.metrics
+        for metric, values in buckets.items():
+            attr, lo, hi = _WEARABLE_METRICS[metric]
+            arr = np.clip(np.fromiter(values, dtype=np.float64, count=len(values)), lo, hi)
+            setattr(metrics, attr, float(arr[-1]))
+        twin.dirty_metrics.update(buckets)
 
     async def _update_from_labs(self, twin: TwinState, event: Event) -> None:
         """Update twin with lab biomarkers for biological age calculation."""
@@ -198,39 +334,23 @@ class DigitalTwinAgent(BaseAgent):
         # Evidence-based biological age delta calculation
         # Based on established biomarker ranges from longevity research
         age_factors = []
-        
-        # CRP (inflammation marker)
-        crp = biomarkers.get("crp") or biomarkers.get("c-reactive protein")
-        if crp is not None:
-            if crp < 1.0:
-                age_factors.append(-1.0)  # Low inflammation, younger
-            elif crp > 3.0:
-                age_factors.append(2.0)   # High inflammation, older
-        
-        # HbA1c (metabolic health)
-        hba1c = biomarkers.get("hba1c") or biomarkers.get("a1c")
-        if hba1c is not None:
-            if hba1c < 5.4:
-                age_factors.append(-0.5)  # Good metabolic health
-            elif hba1c > 5.7:
-                age_factors.append(1.5)   # Prediabetic range
-        
-        # Vitamin D (immune function)
-        vit_d = biomarkers.get("vitamin d") or biomarkers.get("25-hydroxyvitamin d")
-        if vit_d is not None:
-            if vit_d > 40:  # ng/ml
-                age_factors.append(-0.3)  # Optimal level
-            elif vit_d < 20:
-                age_factors.append(1.0)   # Deficient
+        for aliases, low, low_score, high, high_score in _BIOAGE_BANDS:
+            value = next((v for v in map(biomarkers.get, aliases) if v is not None), None)
+            if value is None:
+                continue
+            if value < low:
+                age_factors.append(low_score)
+            elif value > high:
+                age_factors.append(high_score)
         
         if age_factors:
             twin.biological_age_delta = sum(age_factors) / len(age_factors)
 
     async def _recalculate_twin(self, twin: TwinState, event: Event) -> None:
         """Recalculate twin based on update request."""
-        # Force recalculation of vitality and trends
-        self._calculate_vitality_score(twin)
-        await self._calculate_trends(twin)
+        # Vitality and trends are recomputed by handle(); force a full trend pass
+        twin.dirty_metrics.update(_TREND_METRICS)
+        twin.trend_next_run = 0.0
         
         # Request fresh simulation if context suggests intervention changes
         context = event.payload.get("context", {})
@@ -271,58 +391,65 @@ class DigitalTwinAgent(BaseAgent):
         stress_score = 1.0 - metrics.stress_score  # Invert: lower stress is better
         rhr_score = max(0.0, min(1.0, 1.0 - ((metrics.resting_heart_rate - 40.0) / 60.0)))  # 40-100 bpm range
         
-        # Apply evidence-based weights
-        vitality = (
-            hrv_score * self.VITALITY_WEIGHTS["hrv"] +
-            sleep_score * self.VITALITY_WEIGHTS["sleep_efficiency"] +
-            activity_score * self.VITALITY_WEIGHTS["activity"] +
-            recovery_score * self.VITALITY_WEIGHTS["recovery"] +
-            stress_score * self.VITALITY_WEIGHTS["stress"] +
-            rhr_score * self.VITALITY_WEIGHTS["rhr"]
-        )
-        
-        # Ensure bounds and round
-        twin.vitality_score = max(0.0, min(1.0, vitality))
+        # Apply evidence-based weights as a single dot product, bounded to [0, 1]
+        scores = np.array([hrv_score, sleep_score, activity_score, recovery_score, stress_score, rhr_score],
+                          dtype=np.float64)
+        twin.vitality_score = float(np.clip(scores @ self._WEIGHTS, 0.0, 1.0))
+
+    async def _db(self, fn, *args, **kwargs) -> Any:
+        """Run a blocking TimeseriesClient call in a worker thread, bounded by the pool size."""
+        async with self._db_slots:
+            return await asyncio.to_thread(fn, *args, **kwargs)
 
     async def _calculate_trends(self, twin: TwinState) -> None:
         """Calculate 30-day trends for key metrics using time-aware computation."""
+        # Only metrics with new readings, and at most once per TREND_MIN_INTERVAL_SECONDS
+        now_ts = time.time()
+        if now_ts < twin.trend_next_run:
+            return
+        metrics_to_trend = [m for m in _TREND_METRICS if m in twin.dirty_metrics]
+        if not metrics_to_trend:
+            return
+        twin.dirty_metrics.difference_update(metrics_to_trend)
+        twin.trend_next_run = now_ts + self.TREND_MIN_INTERVAL_SECONDS
+        
         # Query historical data from time-series database
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=30)
         
-        metrics_to_trend = ["hrv", "sleep_efficiency", "activity_minutes", "stress_score"]
+        start_iso = start_date.isoformat()
+        end_iso = end_date.isoformat()
         
-        for metric in metrics_to_trend:
+        # The per-metric queries are independent; issue them concurrently (within the pool limit)
+        results = await asyncio.gather(*[
+            self._db(
+                self.ts.query,
+                user_id=twin.user_id,
+                metric=metric,
+                start=start_iso,
+                end=end_iso,
+                limit=1000
+            )
+            for metric in metrics_to_trend
+        ], return_exceptions=True)
+        
+        for metric, data in zip(metrics_to_trend, results):
             try:
-                data = self.ts.query(
-                    user_id=twin.user_id,
-                    metric=metric,
-                    start=start_date.isoformat(),
-                    end=end_date.isoformat(),
-                    limit=1000
-                )
+                if isinstance(data, BaseException):
+                    # Retry on the next event instead of leaving the trend stale until new readings
+                    twin.dirty_metrics.add(metric)
+                    twin.trend_next_run = 0.0
+                    raise data
                 
                 if len(data) > 5:  # Need minimum data points for reliable trend
-                    # Calculate time-aware linear trend
-                    timestamps = []
-                    values = []
+                    # Calculate time-aware linear trend; timestamps are parsed as one column
+                    t_arr, v_arr = _series_arrays(data)
                     
-                    for d in data:
-                        try:
-                            ts = datetime.fromisoformat(d["ts"].replace('Z', '+00:00'))
-                            timestamps.append(ts.timestamp())
-                            values.append(d["value"])
-                        except (ValueError, TypeError, KeyError):
-                            continue
-                    
-                    if len(timestamps) > 1:
-                        # Calculate slope using time deltas
-                        n = len(timestamps)
-                        t_mean = sum(timestamps) / n
-                        v_mean = sum(values) / n
-                        
-                        numerator = sum((t - t_mean) * (v - v_mean) for t, v in zip(timestamps, values))
-                        denominator = sum((t - t_mean) ** 2 for t in timestamps)
+                    if t_arr.size > 1:
+                        # Closed-form least-squares slope over time deltas, vectorized
+                        dt = t_arr - t_arr.mean()
+                        numerator = float(dt @ (v_arr - v_arr.mean()))
+                        denominator = float(dt @ dt)
                         
                         if denominator > 0:
                             slope = numerator / denominator
@@ -345,91 +472,123 @@ class DigitalTwinAgent(BaseAgent):
                             twin.trend_indicators[f"{metric}_trend"] = round(trend_score, 3)
                             
             except Exception as e:
-                logger.debug(f"Could not calculate trend for {metric}: {e}")
+                logger.debug("Could not calculate trend for {}: {}", metric, e)
 
-    async def _schedule_persistence(self, twin: TwinState) -> None:
+    async def _schedule_persistence(self, twin: TwinState, now_iso: str, metrics_dict: Optional[JsonDict] = None) -> None:
         """Schedule persistence based on time interval."""
-        now = datetime.utcnow()
-        should_persist = False
-        
         # Check if enough time has passed or this is first persistence
-        if twin.last_persistence is None:
-            should_persist = True
-        else:
-            try:
-                last_persist_time = datetime.fromisoformat(twin.last_persistence)
-                if (now - last_persist_time).total_seconds() >= self._persistence_interval_seconds:
-                    should_persist = True
-            except (ValueError, TypeError):
-                should_persist = True
+        now_ts = time.time()
+        should_persist = (now_ts - twin.last_persistence_epoch) >= self._persistence_interval_seconds
         
         if should_persist:
-            # Cancel any existing persistence task for this user
-            if twin.user_id in self._persistence_tasks:
-                self._persistence_tasks[twin.user_id].cancel()
-            
-            # Schedule new persistence
-            task = asyncio.create_task(self._persist_twin_state(twin))
-            self._persistence_tasks[twin.user_id] = task
-            twin.last_persistence = now.isoformat()
+            self._queue_snapshot(twin, "scheduled", metrics_dict)
+            twin.last_persistence_epoch = now_ts
+            twin.last_persistence = now_iso
+
+    def _queue_snapshot(self, twin: TwinState, persistence_type: str, metrics_dict: Optional[JsonDict] = None) -> None:
+        """Snapshot a twin now; the persistence worker writes it in a later batch."""
+        self._persist_queue.put_nowait((twin, {
+            "user_id": twin.user_id,
+            "metric": "twin_state",
+            "ts": twin.updated_at,
+            "value": twin.vitality_score,
+            # Serialized up front: freezes the snapshot and skips re-encoding in the client
+            "meta": orjson.dumps({
+                "state": twin.to_dict(metrics_dict),
+                "version": twin.version,
+                "persistence_type": persistence_type
+            }).decode()
+        }))
+
+    async def _persist_loop(self) -> None:
+        """
+        Persist queued twin snapshots in batches of up to PERSIST_MAX_BATCH rows.
+
+        A None sentinel persists whatever is still queued and stops the loop.
+        """
+        stopping = False
+        while not stopping:
+            item = await self._persist_queue.get()
+            if item is None:
+                break
+            batch = [item]
+            while len(batch) < self.PERSIST_MAX_BATCH:
+                try:
+                    item = self._persist_queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            if not await self._persist_twin_states(batch) and not stopping:
+                await asyncio.sleep(self.PERSIST_RETRY_SECONDS)
 
-    async def _persist_twin_state(self, twin: TwinState) -> None:
-        """Persist twin state for recovery and analysis."""
+    async def _persist_twin_states(self, batch: List[tuple]) -> bool:
+        """Persist (twin, snapshot row) pairs for recovery and analysis; False if the write failed."""
         try:
-            # Store as special time-series entry
-            self.ts.insert_measurements([{
-                "user_id": twin.user_id,
-                "metric": "twin_state",
-                "ts": twin.updated_at,
-                "value": twin.vitality_score,
-                "meta": {
-                    "state": asdict(twin),
-                    "version": twin.version,
-                    "persistence_type": "scheduled"
-                }
-            }])
-            logger.debug(f"Persisted twin state for user {twin.user_id}, version {twin.version}")
+            # Store as special time-series entries
+            await self._db(self.ts.insert_measurements, [row for _, row in batch])
+            logger.debug("Persisted {} twin states", len(batch))
         except Exception as e:
-            logger.error(f"Failed to persist twin state for user {twin.user_id}: {e}")
-            # Reset last persistence time to retry
-            twin.last_persistence = None
+            logger.error(f"Failed to persist {len(batch)} twin states: {e}")
+            for twin, row in batch:
+                if self._twins.get(twin.user_id) is twin:
+                    # Reset last persistence time so the next event retries
+                    twin.last_persistence = None
+                    twin.last_persistence_epoch = 0.0
+                elif self._evicted.get(twin.user_id) is twin:
+                    # No later event will snapshot an evicted twin; write this one again
+                    self._persist_queue.put_nowait((twin, row))
+            return False
+        for twin, _ in batch:
+            if self._evicted.get(twin.user_id) is twin:
+                del self._evicted[twin.user_id]
+        return True
 
     async def _load_twin_state(self, user_id: str) -> Optional[TwinState]:
-        """Load most recent twin state from persistence."""
+        """
+        Load most recent twin state from persistence; None only if nothing usable is stored.
+
+        Database errors propagate: treating them as "no saved state" would start a fresh
+        twin whose first snapshot overwrites the user's persisted one.
+        """
+        # Query latest twin state
+        data = await self._db(
+            self.ts.query,
+            user_id=user_id,
+            metric="twin_state",
+            limit=1
+        )
+        
+        if not (data and data[0].get("meta", {}).get("state")):
+            return None
+        
         try:
-            # Query latest twin state
-            data = self.ts.query(
+            state_dict = data[0]["meta"]["state"]
+            
+            # Reconstruct metrics with validation
+            metrics_dict = state_dict.get("metrics", {})
+            metrics = HealthMetrics(**metrics_dict)
+            
+            # Reconstruct twin state
+            twin = TwinState(
                 user_id=user_id,
-                metric="twin_state",
-                limit=1
+                created_at=state_dict.get("created_at"),
+                updated_at=state_dict.get("updated_at"),
+                metrics=metrics,
+                vitality_score=state_dict.get("vitality_score", 0.0),
+                biological_age_delta=state_dict.get("biological_age_delta", 0.0),
+                trend_indicators=state_dict.get("trend_indicators", {}),
+                intervention_efficacy=state_dict.get("intervention_efficacy", {}),
+                last_sync=state_dict.get("last_sync"),
+                version=state_dict.get("version", 1),
+                last_persistence=state_dict.get("last_persistence")
             )
-            
-            if data and data[0].get("meta", {}).get("state"):
-                state_dict = data[0]["meta"]["state"]
-                
-                # Reconstruct metrics with validation
-                metrics_dict = state_dict.get("metrics", {})
-                metrics = HealthMetrics(**metrics_dict)
-                
-                # Reconstruct twin state
-                twin = TwinState(
-                    user_id=user_id,
-                    created_at=state_dict.get("created_at"),
-                    updated_at=state_dict.get("updated_at"),
-                    metrics=metrics,
-                    vitality_score=state_dict.get("vitality_score", 0.0),
-                    biological_age_delta=state_dict.get("biological_age_delta", 0.0),
-                    trend_indicators=state_dict.get("trend_indicators", {}),
-                    intervention_efficacy=state_dict.get("intervention_efficacy", {}),
-                    last_sync=state_dict.get("last_sync"),
-                    version=state_dict.get("version", 1),
-                    last_persistence=state_dict.get("last_persistence")
-                )
-                
-                logger.debug(f"Loaded twin state for user {user_id}, version {twin.version}")
-                return twin
-                
-        except Exception as e:
-            logger.error(f"Failed to load twin state for user {user_id}: {e}")
+        except (AttributeError, TypeError, ValueError) as e:
+            # Unreadable snapshot (e.g. an older schema); start over rather than fail every event
+            logger.error(f"Discarding unreadable twin state for user {user_id}: {e}")
+            return None
         
-        return None
\ No newline at end of file
+        logger.debug("Loaded twin state for user {}, version {}", user_id, twin.version)
+        return twin
@@ -2,6 +2,8 @@ import asyncio
 import json
 import os
 import sys
+import threading
+from functools import lru_cache
 from pathlib import Path
 from typing import Any, Dict, Optional
 
@@ -24,7 +26,56 @@ from enhanced_import_system import EnhancedGraphBuilder, EnhancedPubMedFetcher,
 JsonDict = Dict[str, Any]
 
 
+# Import configuration files do not change mid-run; read and parse them once.
+# Call reload_import_config() (e.g. from a SIGHUP handler) to pick up edits.
+@lru_cache(maxsize=1)
+def _load_import_config() -> ImportConfig:
+    return ImportConfig.from_yaml()
+
+
+@lru_cache(maxsize=1)
+def _load_search_terms():
+    return load_search_terms()
+
+
+@lru_cache(maxsize=1)
+def _load_pubmed_email() -> str:
+    try:
+        with open("config/config.yaml", "r") as f:
+            return json.load(f).get("data_sources", {}).get("pubmed", {}).get("email", "demo@example.com")
+    except Exception:
+        return "demo@example.com"
+
+
+def reload_import_config() -> None:
+    _load_import_config.cache_clear()
+    _load_search_terms.cache_clear()
+    _load_pubmed_email.cache_clear()
+
+
+class _Serialized:
+    """Proxy running every method call on the wrapped object under one lock."""
+
+    def __init__(self, target: Any):
+        self._target = target
+        self._lock = threading.RLock()
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+
+        def locked(*args, **kwargs):
+            with self._lock:
+                return attr(*args, **kwargs)
+        return locked
+
+
 class KnowledgeGraphAgent(BaseAgent):
+    # Parallel ClinicalTrials.gov query chains, each with its own fetcher. Kept low: the API
+    # allows roughly 50 requests/min per IP. PubMed queries always run one at a time.
+    CLINICALTRIALS_CONCURRENCY = 2
+
     def __init__(self, bus):
         super().__init__(AgentConfig(
             name="knowledge_graph_agent",
@@ -41,44 +92,62 @@ class KnowledgeGraphAgent(BaseAgent):
     async def _import_research_and_sync(self, correlation_id: Optional[str]) -> None:
         logger.info("Starting research import")
         # Load config and tracker from existing system
-        config = ImportConfig.from_yaml()
+        config = _load_import_config()
         tracker = DownloadTracker() if config.enable_tracking else None
         extractor = EnhancedEntityExtractor()
         graph_builder = EnhancedGraphBuilder()
 
         # Pull search terms
-        pubmed_terms, ct_params = load_search_terms()
+        pubmed_terms, ct_params = _load_search_terms()
 
         # Load email
-        try:
-            with open("config/config.yaml", "r") as f:
-                email = json.load(f).get("data_sources", {}).get("pubmed", {}).get("email", "demo@example.com")
-        except Exception:
-            email = "demo@example.com"
-
-        all_studies = []
-        # PubMed
-        if config.enable_pubmed:
-            pubmed_fetcher = EnhancedPubMedFetcher(email, config, tracker)
+        email = _load_pubmed_email()
+
+        # The DownloadTracker is shared by every fetcher and persists its state file on
+        # updates; serialize its calls since fetchers run in worker threads
+        if tracker is not None:
+            tracker = _Serialized(tracker)
+
+        # Fetchers do blocking HTTP; run them in worker threads. The fetcher classes are not
+        # known to be thread-safe, so no fetcher instance is ever used by two threads at once.
+        async def pubmed_queries():
+            # One fetcher, one query at a time: NCBI E-utilities allow 3 requests/s without an
+            # API key (10/s with one) and the fetcher paces its own requests, so parallel
+            # queries would multiply the request rate past the limit
+            fetcher = EnhancedPubMedFetcher(email, config, tracker)
+            studies = []
             for query in pubmed_terms:
-                pmids = pubmed_fetcher.search_with_progress(query, config.pubmed_max_per_query)
+                pmids = await asyncio.to_thread(fetcher.search_with_progress, query, config.pubmed_max_per_query)
                 if pmids:
-                    articles = pubmed_fetcher.fetch_articles_with_progress(pmids, query)
-                    all_studies.extend(articles)
-        # ClinicalTrials
+                    studies.extend(await asyncio.to_thread(fetcher.fetch_articles_with_progress, pmids, query))
+            return studies
+
+        ct_slots = asyncio.Semaphore(self.CLINICALTRIALS_CONCURRENCY)
+
+        async def clinicaltrials_query(params):
+            async with ct_slots:
+                fetcher = EnhancedClinicalTrialsFetcher(config, tracker)
+                studies = await asyncio.to_thread(fetcher.search_with_progress, params, config.clinicaltrials_max_per_query)
+                if not studies:
+                    return []
+                return await asyncio.to_thread(fetcher.parse_studies_with_progress, studies, str(params))
+
+        # PubMed's sequential chain overlaps with the ClinicalTrials.gov queries
+        fetches = []
+        if config.enable_pubmed:
+            fetches.append(pubmed_queries())
         if config.enable_clinicaltrials:
-            ct_fetcher = EnhancedClinicalTrialsFetcher(config, tracker)
-            for params in ct_params:
-                studies = ct_fetcher.search_with_progress(params, config.clinicaltrials_max_per_query)
-                if studies:
-                    trials = ct_fetcher.parse_studies_with_progress(studies, str(params))
-                    all_studies.extend(trials)
+            fetches.extend(clinicaltrials_query(params) for params in ct_params)
+
+        all_studies = []
+        for studies in await asyncio.gather(*fetches):
+            all_studies.extend(studies)
 
         # Build graph data
-        graph_data = graph_builder.process_studies_with_progress(all_studies, extractor)
+        graph_data = await asyncio.to_thread(graph_builder.process_studies_with_progress, all_studies, extractor)
 
         # Persist to Neo4j
-        self._graph_client.sync_graph(graph_data)
+        await asyncio.to_thread(self._graph_client.sync_graph, graph_data)
 
         # Publish update
         await self.publish(
@@ -40,7 +40,7 @@ class Orchestrator(BaseAgent):
         logger.info(f"Registered agent {agent.config.name}")
 
     async def handle(self, event: Event) -> None:
-        logger.info(f"Orchestrator handling event type={event.type} topic={event.topic}")
+        logger.info("Orchestrator handling event type={} topic={}", event.type, event.topic)
         if event.topic in ("ingest.wearables.standardized", "ingest.labs.standardized"):
             await self._trigger_twin_update(event)
             await self._trigger_protocol_refresh(event)
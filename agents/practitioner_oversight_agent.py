@@ -1,11 +1,14 @@
-from typing import Any, Dict, List, Optional
+import itertools
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Set
 from dataclasses import dataclass, field
 from datetime import datetime
+import orjson
 from loguru import logger
 
 from agents.base import BaseAgent, AgentConfig
 from common.event_bus import Event
-from common.privacy.audit import audit_event
+from common.privacy.audit import audit_async
 
 JsonDict = Dict[str, Any]
 
@@ -16,11 +19,29 @@ class ReviewRecord:
     user_id: str
     status: str  # draft, awaiting_review, approved, rejected
     reviewers_required: int
-    reviewers: List[str] = field(default_factory=list)
-    approvals: List[str] = field(default_factory=list)
-    rejections: List[str] = field(default_factory=list)
+    reviewers: Set[str] = field(default_factory=set)
+    approvals: Set[str] = field(default_factory=set)
+    rejections: Set[str] = field(default_factory=set)
     comments: List[Dict[str, str]] = field(default_factory=list)
     updated_at: str = field(default_factory=lambda: datetime.utcnow().isoformat())
+    # Serialized detail view; reset by the agent whenever the review changes
+    _cached_json: Optional[bytes] = field(default=None, init=False, repr=False, compare=False)
+
+    def to_json(self) -> bytes:
+        """Detail view as JSON bytes, serialized once per review update."""
+        if self._cached_json is None:
+            self._cached_json = orjson.dumps({
+                "protocol_id": self.protocol_id,
+                "user_id": self.user_id,
+                "status": self.status,
+                "reviewers_required": self.reviewers_required,
+                "reviewers": sorted(self.reviewers),
+                "approvals": sorted(self.approvals),
+                "rejections": sorted(self.rejections),
+                "comments": self.comments,
+                "updated_at": self.updated_at
+            })
+        return self._cached_json
 
 
 class PractitionerOversightAgent(BaseAgent):
@@ -30,15 +51,26 @@ class PractitionerOversightAgent(BaseAgent):
             subscribe_topics=["protocol.generated", "protocol.review.requested"]
         ), bus)
         self._reviews: Dict[str, ReviewRecord] = {}
+        # Secondary indexes over _reviews for filtered listing; kept in step by _track
+        self._reviews_by_status: Dict[str, Set[str]] = defaultdict(set)
+        self._reviews_by_reviewer: Dict[str, Set[str]] = defaultdict(set)
+        self._review_seq: Dict[str, int] = {}  # protocol_id -> creation order
+        self._seq = itertools.count()
 
     async def handle(self, event: Event) -> None:
+        # Read the clock once per event
+        now = datetime.utcnow()
         if event.topic == "protocol.generated":
-            pid = f"prot_{event.user_id}_{int(datetime.utcnow().timestamp())}"
+            pid = f"prot_{event.user_id}_{int(now.timestamp())}"
+            self._untrack(pid)
             self._reviews[pid] = ReviewRecord(
                 protocol_id=pid, user_id=event.user_id or "unknown",
-                status="awaiting_review", reviewers_required=2
+                status="awaiting_review", reviewers_required=2,
+                updated_at=now.isoformat()
             )
-            audit_event("review.opened", user_id=event.user_id, details={"protocol_id": pid}, correlation_id=event.correlation_id)
+            self._review_seq[pid] = next(self._seq)
+            self._reviews_by_status["awaiting_review"].add(pid)
+            audit_async("review.opened", user_id=event.user_id, details={"protocol_id": pid}, correlation_id=event.correlation_id)
             await self._publish_update(pid, "awaiting_review", event.user_id, event.correlation_id)
 
         elif event.topic == "protocol.review.requested":
@@ -54,13 +86,15 @@ class PractitionerOversightAgent(BaseAgent):
                 logger.warning(f"Unknown protocol_id={pid}")
                 return
 
-            if reviewer not in rec.reviewers:
-                rec.reviewers.append(reviewer)
+            rec._cached_json = None
+            rec.reviewers.add(reviewer)
+            self._reviews_by_reviewer[reviewer].add(pid)
+            previous_status = rec.status
 
-            if action == "approve" and reviewer not in rec.approvals:
-                rec.approvals.append(reviewer)
-            if action == "reject" and reviewer not in rec.rejections:
-                rec.rejections.append(reviewer)
+            if action == "approve":
+                rec.approvals.add(reviewer)
+            if action == "reject":
+                rec.rejections.add(reviewer)
 
             if comment:
                 rec.comments.append({"reviewer": reviewer, "comment": comment})
@@ -73,11 +107,37 @@ class PractitionerOversightAgent(BaseAgent):
             else:
                 rec.status = "awaiting_review"
 
-            rec.updated_at = datetime.utcnow().isoformat()
+            if rec.status != previous_status:
+                self._reviews_by_status[previous_status].discard(pid)
+                self._reviews_by_status[rec.status].add(pid)
+
+            rec.updated_at = now.isoformat()
             self._reviews[pid] = rec
-            audit_event("review.updated", user_id=rec.user_id, details={"protocol_id": pid, "status": rec.status}, correlation_id=event.correlation_id)
+            audit_async("review.updated", user_id=rec.user_id, details={"protocol_id": pid, "status": rec.status}, correlation_id=event.correlation_id)
             await self._publish_update(pid, rec.status, rec.user_id, event.correlation_id)
 
+    def find_reviews(self, status: Optional[str] = None, reviewer: Optional[str] = None) -> List[ReviewRecord]:
+        """Reviews matching the given filters, in creation order; looks up only matching ids."""
+        if not status and not reviewer:
+            return list(self._reviews.values())
+        candidates = []
+        if status:
+            candidates.append(self._reviews_by_status.get(status, set()))
+        if reviewer:
+            candidates.append(self._reviews_by_reviewer.get(reviewer, set()))
+        candidates.sort(key=len)
+        pids = candidates[0].intersection(*candidates[1:])
+        return [self._reviews[pid] for pid in sorted(pids, key=self._review_seq.__getitem__)]
+
+    def _untrack(self, protocol_id: str) -> None:
+        """Drop a review that is about to be replaced from the secondary indexes."""
+        rec = self._reviews.get(protocol_id)
+        if rec is None:
+            return
+        self._reviews_by_status[rec.status].discard(protocol_id)
+        for reviewer in rec.reviewers:
+            self._reviews_by_reviewer[reviewer].discard(protocol_id)
+
     async def _publish_update(self, protocol_id: str, status: str, user_id: Optional[str], correlation_id: Optional[str]):
         await self.publish(
             topic="protocol.review.updated",
@@ -1,11 +1,39 @@
+import heapq
+import re
+import sys
+from collections import defaultdict
 from typing import Any, Dict, List, Optional
 from dataclasses import dataclass, field
+import numpy as np
 from loguru import logger
 
 from agents.base import BaseAgent, AgentConfig
 from common.event_bus import Event
-from common.privacy.consent import consent_store
-from common.privacy.audit import audit_event
+from common.privacy.audit import audit_async
+
+
+def _normalized(values: List[str]) -> frozenset:
+    # Interned so catalog and profile sets share string objects and compare by identity first
+    return frozenset(sys.intern(v.lower().strip()) for v in values)
+
+
+def _interned(values: List[str]) -> List[str]:
+    return [sys.intern(v) if isinstance(v, str) else v for v in values]
+
+
+# Protocol keywords -> inferred health goal, in the order goals are reported
+_PROTOCOL_GOAL_KEYWORDS = {
+    "sleep_quality": ("sleep",),
+    "stress_reduction": ("stress", "cortisol"),
+    "energy": ("energy", "fatigue"),
+    "immunity": ("immunity", "immune"),
+}
+# Single-pass scan; zero-width lookaheads so overlapping keywords are all seen
+_PROTOCOL_GOAL_RE = re.compile(
+    "|".join(f"(?=(?P<{goal}>{'|'.join(map(re.escape, words))}))" for goal, words in _PROTOCOL_GOAL_KEYWORDS.items()),
+    re.IGNORECASE
+)
+
 
 @dataclass
 class Product:
@@ -22,6 +50,33 @@ class Product:
     evidence_level: str = "moderate"
     dosage_info: str = ""
     quality_score: float = 0.7
+    # Normalized safety lookups, built once at catalog load
+    _contra_fs: frozenset = field(init=False, repr=False, compare=False)
+    _interactions_fs: frozenset = field(init=False, repr=False, compare=False)
+    _allergens_fs: frozenset = field(init=False, repr=False, compare=False)
+    _ingredients_fs: frozenset = field(init=False, repr=False, compare=False)
+    _goals_set: frozenset = field(init=False, repr=False, compare=False)
+    # Safety warnings only depend on the product, so they are formatted once
+    _warnings: tuple = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.tags = _interned(self.tags)
+        self.health_goals = _interned(self.health_goals)
+        self._contra_fs = _normalized(self.contraindications)
+        self._interactions_fs = _normalized(self.interactions)
+        self._allergens_fs = _normalized(self.allergens)
+        self._ingredients_fs = _normalized(self.active_ingredients)
+        self._goals_set = frozenset(self.health_goals)
+        warnings = []
+        if self.contraindications:
+            warnings.append(f"Not recommended if you have: {', '.join(self.contraindications)}")
+        if self.interactions:
+            warnings.append(f"May interact with: {', '.join(self.interactions)}")
+        if self.allergens:
+            warnings.append(f"Contains: {', '.join(self.allergens)}")
+        warnings.append("Consult healthcare provider before starting new supplements")
+        # Remove any empty warnings
+        self._warnings = tuple(w for w in warnings if w and w.strip())
 
 @dataclass
 class UserHealthProfile:
@@ -37,19 +92,31 @@ class UserHealthProfile:
 class ProductCuratorAgent(BaseAgent):
     """Agent for safe, evidence-based product curation with comprehensive safety validation."""
     
+    # Profiles kept in memory; the least recently used is dropped beyond this
+    MAX_USER_PROFILES = 50_000
+    # Relevance contribution of each evidence level (30% of score); unknown levels score 0.1
+    _EVIDENCE_SCORES = {"high": 0.3, "moderate": 0.2, "low": 0.1}
+    # Catalogs larger than this get an inverted safety index, so only products
+    # flagged by the profile's terms run the per-product safety checks
+    SAFETY_INDEX_MIN_CATALOG = 256
+    
     def __init__(self, bus, catalog: Optional[List[Product]] = None):
         super().__init__(AgentConfig(
             name="product_curator_agent",
             subscribe_topics=[
                 "product.recommendation.requested",
                 "protocol.generated",
-                "user.twin.updated"
+                "user.twin.updated",
+                "consent.changed"
             ]
         ), bus)
         
         self.catalog = catalog or self._initialize_catalog()
+        self._index_catalog()
         self.max_recommendations = 5
+        # Ordered by recency of use (dict insertion order); see _remember_profile
         self._user_profiles: Dict[str, UserHealthProfile] = {}
+        self._profile_evictions = 0
         
     def _initialize_catalog(self) -> List[Product]:
         """Initialize evidence-based product catalog with comprehensive safety data."""
@@ -109,19 +176,18 @@ class ProductCuratorAgent(BaseAgent):
             logger.warning("No user_id in product curation event")
             return
         
-        # Check consent for personalization
-        has_consent = consent_store.check(user_id, "personalization")
-        
+        # Each handler checks personalization consent only once it knows it needs it
         if event.topic == "product.recommendation.requested":
-            await self._handle_recommendation_request(user_id, payload, event.correlation_id, has_consent)
+            await self._handle_recommendation_request(user_id, payload, event.correlation_id)
         elif event.topic == "protocol.generated":
-            await self._handle_protocol_generated(user_id, payload, event.correlation_id, has_consent) 
+            await self._handle_protocol_generated(user_id, payload, event.correlation_id)
         elif event.topic == "user.twin.updated":
-            await self._handle_twin_updated(user_id, payload, has_consent)
+            await self._handle_twin_updated(user_id, payload)
 
     async def _handle_recommendation_request(self, user_id: str, payload: Dict[str, Any], 
-                                           correlation_id: Optional[str], has_consent: bool) -> None:
+                                           correlation_id: Optional[str]) -> None:
         """Handle explicit product recommendation requests."""
+        has_consent = self._check_consent(user_id, "personalization")
         if has_consent:
             profile = self._get_user_profile(user_id, payload)
             recommendations = self._generate_personalized_recommendations(profile)
@@ -145,36 +211,32 @@ class ProductCuratorAgent(BaseAgent):
         )
 
     async def _handle_protocol_generated(self, user_id: str, payload: Dict[str, Any],
-                                       correlation_id: Optional[str], has_consent: bool) -> None:
+                                       correlation_id: Optional[str]) -> None:
         """Handle protocol generation events to suggest relevant products."""
-        if not has_consent:
-            return  # Skip product suggestions if no consent for personalization
-            
         # Extract context from generated protocol
-        protocol_text = payload.get("protocol", "").lower()
-        inferred_goals = []
-        
-        if "sleep" in protocol_text:
-            inferred_goals.append("sleep_quality")
-        if "stress" in protocol_text or "cortisol" in protocol_text:
-            inferred_goals.append("stress_reduction")
-        if "energy" in protocol_text or "fatigue" in protocol_text:
-            inferred_goals.append("energy")
-        if "immunity" in protocol_text or "immune" in protocol_text:
-            inferred_goals.append("immunity")
-        
-        if inferred_goals:
+        protocol_text = payload.get("protocol", "")
+        found = set()
+        for match in _PROTOCOL_GOAL_RE.finditer(protocol_text):
+            found.add(match.lastgroup)
+            if len(found) == len(_PROTOCOL_GOAL_KEYWORDS):
+                break
+        inferred_goals = [goal for goal in _PROTOCOL_GOAL_KEYWORDS if goal in found]
+        
+        # Skip profile updates if no consent for personalization; protocols with no
+        # goal keywords never need the consent lookup
+        if inferred_goals and self._check_consent(user_id, "personalization"):
             # Update user profile with inferred goals
-            if user_id not in self._user_profiles:
-                self._user_profiles[user_id] = UserHealthProfile(user_id=user_id, source="protocol_inference")
+            profile = self._profile_for(user_id, source="protocol_inference")
             
-            self._user_profiles[user_id].health_goals.extend(inferred_goals)
+            # Only add goals not already present so repeated protocols don't grow the list
+            known = set(profile.health_goals)
+            profile.health_goals.extend(g for g in inferred_goals if g not in known)
             
-            logger.info(f"Updated user {user_id} profile with goals inferred from protocol: {inferred_goals}")
+            logger.info("Updated user {} profile with goals inferred from protocol: {}", user_id, inferred_goals)
 
-    async def _handle_twin_updated(self, user_id: str, payload: Dict[str, Any], has_consent: bool) -> None:
+    async def _handle_twin_updated(self, user_id: str, payload: Dict[str, Any]) -> None:
         """Handle digital twin updates to refine user health profile."""
-        if not has_consent:
+        if not self._check_consent(user_id, "personalization"):
             return
             
         # Extract health indicators from twin data
@@ -182,10 +244,7 @@ class ProductCuratorAgent(BaseAgent):
         trends = payload.get("trends", {})
         
         # Update or create user profile based on twin data
-        if user_id not in self._user_profiles:
-            self._user_profiles[user_id] = UserHealthProfile(user_id=user_id, source="twin_data")
-        
-        profile = self._user_profiles[user_id]
+        profile = self._profile_for(user_id, source="twin_data")
         
         # Infer health goals from vitality and trends
         if vitality_score < 0.5:
@@ -197,13 +256,14 @@ class ProductCuratorAgent(BaseAgent):
             if "stress_reduction" not in profile.health_goals:
                 profile.health_goals.append("stress_reduction")
         
-        logger.debug(f"Updated user {user_id} health profile from twin data")
+        logger.debug("Updated user {} health profile from twin data", user_id)
 
     def _get_user_profile(self, user_id: str, payload: Dict[str, Any]) -> UserHealthProfile:
         """Get or create user health profile with safety data."""
         # Check cache first
-        if user_id in self._user_profiles:
-            return self._user_profiles[user_id]
+        profile = self._cached_profile(user_id)
+        if profile is not None:
+            return profile
         
         # Create from event payload if available
         profile = UserHealthProfile(user_id=user_id)
@@ -213,7 +273,7 @@ class ProductCuratorAgent(BaseAgent):
             profile.health_conditions = health_data.get("conditions", [])
             profile.medications = health_data.get("medications", [])
             profile.allergies = health_data.get("allergies", [])
-            profile.health_goals = health_data.get("goals", [])
+            profile.health_goals = _interned(health_data.get("goals", []))
             profile.avoid_ingredients = health_data.get("avoid_ingredients", [])
             profile.source = "event_payload"
         else:
@@ -221,53 +281,197 @@ class ProductCuratorAgent(BaseAgent):
             profile.health_goals = ["general_wellness"]
             profile.source = "default"
         
-        self._user_profiles[user_id] = profile
+        return self._remember_profile(profile)
+
+    def _cached_profile(self, user_id: str) -> Optional[UserHealthProfile]:
+        """Return a cached profile and mark it most recently used."""
+        profile = self._user_profiles.pop(user_id, None)
+        if profile is not None:
+            self._user_profiles[user_id] = profile
+        return profile
+
+    def _profile_for(self, user_id: str, source: str) -> UserHealthProfile:
+        """Cached profile for user_id, or a new empty one tagged with source."""
+        profile = self._cached_profile(user_id)
+        if profile is None:
+            profile = self._remember_profile(UserHealthProfile(user_id=user_id, source=source))
         return profile
 
+    def _remember_profile(self, profile: UserHealthProfile) -> UserHealthProfile:
+        """Cache a profile, dropping the least recently used one when full."""
+        self._user_profiles[profile.user_id] = profile
+        if len(self._user_profiles) > self.MAX_USER_PROFILES:
+            del self._user_profiles[next(iter(self._user_profiles))]
+            self._profile_evictions += 1
+            if self._profile_evictions % 1000 == 1:
+                logger.info(f"{self.config.name} evicted {self._profile_evictions} cold user profiles so far")
+        return profile
+
+    def _index_catalog(self) -> None:
+        """Build the goal index, column arrays and user-independent relevance ranking over the catalog."""
+        goal_positions: Dict[str, List[int]] = defaultdict(list)
+        for pos, product in enumerate(self.catalog):
+            for goal in dict.fromkeys(product.health_goals):
+                goal_positions[goal].append(pos)
+        self._goal_positions = {g: np.array(p, dtype=np.intp) for g, p in goal_positions.items()}
+        # Score inputs as columns so goal-matched products are scored in one array expression
+        self._evidence = np.array([self._EVIDENCE_SCORES.get(p.evidence_level, 0.1) for p in self.catalog], dtype=np.float64)
+        self._quality_term = 0.3 * np.array([p.quality_score for p in self.catalog], dtype=np.float64)
+        # Without a goal match, relevance depends only on the product
+        no_goals = UserHealthProfile(user_id="")
+        self._base_relevance = [self._calculate_relevance_score(p, no_goals, frozenset()) for p in self.catalog]
+        self._base_relevance_arr = np.array(self._base_relevance, dtype=np.float64)
+        self._by_base_relevance = sorted(range(len(self.catalog)), key=self._base_relevance.__getitem__, reverse=True)
+        self._safety_index = self._build_safety_index() if len(self.catalog) > self.SAFETY_INDEX_MIN_CATALOG else None
+
+    def _build_safety_index(self) -> tuple:
+        """Normalized term -> catalog positions, per safety attribute, in _profile_safety_sets order."""
+        indexes = tuple(defaultdict(list) for _ in range(4))
+        for pos, product in enumerate(self.catalog):
+            for index, terms in zip(indexes, (product._contra_fs, product._interactions_fs,
+                                              product._allergens_fs, product._ingredients_fs)):
+                for term in terms:
+                    index[term].append(pos)
+        return tuple(dict(index) for index in indexes)
+
+    def _flagged_positions(self, profile_sets: tuple) -> Optional[set]:
+        """Positions failing at least one safety check, or None when the catalog is not indexed."""
+        if self._safety_index is None:
+            return None
+        flagged = set()
+        for index, terms in zip(self._safety_index, profile_sets):
+            for term in terms:
+                flagged.update(index.get(term, ()))
+        return flagged
+
+    def _safety_exclusions(self, profile: UserHealthProfile, profile_sets: tuple) -> Dict[int, List[str]]:
+        """Catalog position -> safety issues for every product failing a check, in catalog order."""
+        flagged = self._flagged_positions(profile_sets)
+        candidates = range(len(self.catalog)) if flagged is None else sorted(flagged)
+        exclusions: Dict[int, List[str]] = {}
+        for pos in candidates:
+            is_safe, safety_issues = self._validate_product_safety(self.catalog[pos], profile, profile_sets)
+            if not is_safe:
+                exclusions[pos] = safety_issues
+        return exclusions
+
+    def _goal_matched_scores(self, goal_set: frozenset) -> tuple[np.ndarray, np.ndarray]:
+        """Catalog positions sharing a goal with goal_set, and their relevance scores."""
+        hits = [self._goal_positions[g] for g in goal_set if g in self._goal_positions]
+        if not hits:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float64)
+        positions, counts = np.unique(np.concatenate(hits), return_counts=True)
+        # Same terms, in the same order, as _calculate_relevance_score
+        scores = np.minimum(1.0, 0.4 * (counts / len(goal_set)) + self._evidence[positions] + self._quality_term[positions])
+        return positions, scores
+
     def _generate_personalized_recommendations(self, profile: UserHealthProfile) -> List[Dict[str, Any]]:
         """Generate personalized recommendations with comprehensive safety validation."""
-        recommendations = []
-        excluded_count = 0
-        
-        for product in self.catalog:
-            # Comprehensive safety validation
-            is_safe, safety_issues = self._validate_product_safety(product, profile)
-            
-            if not is_safe:
-                excluded_count += 1
-                logger.info(f"Excluded product {product.name} for user {profile.user_id}: {safety_issues}")
+        ranked = []  # (rounded score, -catalog position)
+        evaluated_count = 0
+        profile_sets = self._profile_safety_sets(profile)
+        goal_set = frozenset(profile.health_goals)
+        # Safety is settled for the whole catalog up front (cheap through the safety index),
+        # so the audit counts below cover every product, not just the ones ranked
+        exclusions = self._safety_exclusions(profile, profile_sets)
+        
+        # Products sharing a goal with the user earn a goal bonus; evaluate all of them
+        positions, scores = self._goal_matched_scores(goal_set)
+        for pos, score in zip(positions.tolist(), scores.tolist()):
+            if pos in exclusions:
                 continue
-            
-            # Calculate relevance score for safe products
-            relevance_score = self._calculate_relevance_score(product, profile)
-            
-            if relevance_score > 0.3:  # Minimum relevance threshold
-                recommendations.append({
-                    "id": product.id,
-                    "name": product.name,
-                    "category": product.category,
-                    "score": round(relevance_score, 2),
-                    "rationale": self._generate_rationale(product, profile),
-                    "health_goals": product.health_goals,
-                    "evidence_level": product.evidence_level,
-                    "quality_score": product.quality_score,
-                    "dosage": product.dosage_info,
-                    "safety_warnings": self._generate_safety_warnings(product),
-                    "personalized": True
-                })
-        
-        # Sort by relevance score
-        recommendations.sort(key=lambda x: x["score"], reverse=True)
-        
-        # Log safety audit
-        audit_event("product.safety_review_completed", user_id=profile.user_id, details={
+            evaluated_count += 1
+            _, score = self._evaluate_product(self.catalog[pos], profile, profile_sets, goal_set, score, known_safe=True)
+            if score is not None:
+                ranked.append((score, -pos))
+        
+        # The rest score their base relevance; walk them best-first and stop once no
+        # remaining product could displace one already taken
+        matched = set(positions.tolist())
+        unmatched_taken = 0
+        cutoff = None
+        for pos in self._by_base_relevance:
+            if pos in matched or pos in exclusions:
+                continue
+            base = self._base_relevance[pos]
+            if base <= 0.3 or (cutoff is not None and round(base, 2) < cutoff):
+                break
+            evaluated_count += 1
+            _, score = self._evaluate_product(self.catalog[pos], profile, profile_sets, goal_set, base, known_safe=True)
+            if score is not None:
+                ranked.append((score, -pos))
+                unmatched_taken += 1
+                if unmatched_taken == self.max_recommendations:
+                    cutoff = score
+        
+        # Safe products clearing the relevance threshold across the whole catalog
+        eligible = self._base_relevance_arr.copy()
+        eligible[positions] = scores
+        eligible = eligible > 0.3
+        if exclusions:
+            eligible[list(exclusions)] = False
+        
+        # Top results by relevance score; ties keep catalog order. Rationale and
+        # warnings are only built for the products that make the cut.
+        top = heapq.nlargest(self.max_recommendations, ranked)
+        recommendations = [self._build_recommendation(self.catalog[-neg_pos], profile, goal_set, score)
+                           for score, neg_pos in top]
+        
+        excluded = {self.catalog[pos].id: safety_issues for pos, safety_issues in exclusions.items()}
+        if excluded:
+            # One lazily formatted line per request instead of one per excluded product
+            logger.opt(lazy=True).debug("Excluded products for user {}: {}", lambda: profile.user_id, lambda: excluded)
+        
+        # Log safety audit; written by the background audit task. Counts are catalog-wide;
+        # evaluated_count is how many safe products the pruned ranking scored.
+        audit_async("product.safety_review_completed", user_id=profile.user_id, details={
             "total_products": len(self.catalog),
-            "excluded_count": excluded_count,
-            "recommended_count": len(recommendations),
+            "evaluated_count": evaluated_count,
+            "excluded_count": len(excluded),
+            "excluded_products": excluded,
+            "recommended_count": int(eligible.sum()),
             "profile_source": profile.source
         })
         
-        return recommendations[:self.max_recommendations]
+        return recommendations
+
+    def _evaluate_product(self, product: Product, profile: UserHealthProfile,
+                          profile_sets: tuple, goal_set: frozenset,
+                          relevance_score: Optional[float] = None,
+                          known_safe: bool = False) -> tuple[List[str], Optional[float]]:
+        """Returns (safety issues, rounded score or None if unsafe or below the relevance threshold)."""
+        # Comprehensive safety validation, unless the safety index already cleared the product
+        if known_safe:
+            safety_issues = []
+        else:
+            is_safe, safety_issues = self._validate_product_safety(product, profile, profile_sets)
+            if not is_safe:
+                return safety_issues, None
+        
+        # Calculate relevance score for safe products unless the caller already has it
+        if relevance_score is None:
+            relevance_score = self._calculate_relevance_score(product, profile, goal_set)
+        
+        if relevance_score <= 0.3:  # Minimum relevance threshold
+            return safety_issues, None
+        return safety_issues, round(relevance_score, 2)
+
+    def _build_recommendation(self, product: Product, profile: UserHealthProfile,
+                              goal_set: frozenset, score: float) -> Dict[str, Any]:
+        """Materialize the recommendation payload for a selected product."""
+        return {
+            "id": product.id,
+            "name": product.name,
+            "category": product.category,
+            "score": score,
+            "rationale": self._generate_rationale(product, profile, goal_set),
+            "health_goals": product.health_goals,
+            "evidence_level": product.evidence_level,
+            "quality_score": product.quality_score,
+            "dosage": product.dosage_info,
+            "safety_warnings": self._generate_safety_warnings(product),
+            "personalized": True
+        }
 
     def _generate_general_recommendations(self) -> List[Dict[str, Any]]:
         """Generate general wellness recommendations without personalization."""
@@ -292,71 +496,72 @@ class ProductCuratorAgent(BaseAgent):
         
         return [r for r in recommendations if r]  # Remove empty entries
 
-    def _validate_product_safety(self, product: Product, profile: UserHealthProfile) -> tuple[bool, List[str]]:
+    @staticmethod
+    def _profile_safety_sets(profile: UserHealthProfile) -> tuple[frozenset, frozenset, frozenset, frozenset]:
+        """Normalized (conditions, medications, allergies, avoided ingredients) for one profile."""
+        return (
+            _normalized(profile.health_conditions),
+            _normalized(profile.medications),
+            _normalized(profile.allergies),
+            _normalized(profile.avoid_ingredients),
+        )
+
+    def _validate_product_safety(self, product: Product, profile: UserHealthProfile,
+                                 profile_sets: Optional[tuple] = None) -> tuple[bool, List[str]]:
         """Perform comprehensive safety validation. Returns (is_safe, list_of_issues)."""
         safety_issues = []
+        conditions, medications, allergies, avoided = profile_sets or self._profile_safety_sets(profile)
         
         # Check contraindications against user conditions
-        if product.contraindications and profile.health_conditions:
-            user_conditions = {c.lower().strip() for c in profile.health_conditions}
-            contraindications = {c.lower().strip() for c in product.contraindications}
-            
-            if user_conditions & contraindications:
-                safety_issues.append("contraindications")
+        if not product._contra_fs.isdisjoint(conditions):
+            safety_issues.append("contraindications")
         
         # Check drug interactions
-        if product.interactions and profile.medications:
-            user_medications = {m.lower().strip() for m in profile.medications}
-            interactions = {i.lower().strip() for i in product.interactions}
-            
-            if user_medications & interactions:
-                safety_issues.append("drug_interactions")
+        if not product._interactions_fs.isdisjoint(medications):
+            safety_issues.append("drug_interactions")
         
         # Check allergies
-        if product.allergens and profile.allergies:
-            user_allergies = {a.lower().strip() for a in profile.allergies}
-            product_allergens = {a.lower().strip() for a in product.allergens}
-            
-            if user_allergies & product_allergens:
-                safety_issues.append("allergies")
+        if not product._allergens_fs.isdisjoint(allergies):
+            safety_issues.append("allergies")
         
         # Check avoided ingredients
-        if product.active_ingredients and profile.avoid_ingredients:
-            ingredients = {i.lower().strip() for i in product.active_ingredients}
-            avoided = {a.lower().strip() for a in profile.avoid_ingredients}
-            
-            if ingredients & avoided:
-                safety_issues.append("ingredient_avoidance")
+        if not product._ingredients_fs.isdisjoint(avoided):
+            safety_issues.append("ingredient_avoidance")
         
         is_safe = len(safety_issues) == 0
         return is_safe, safety_issues
 
-    def _calculate_relevance_score(self, product: Product, profile: UserHealthProfile) -> float:
+    def _calculate_relevance_score(self, product: Product, profile: UserHealthProfile,
+                                   goal_set: Optional[frozenset] = None) -> float:
         """Calculate relevance score based on user goals and evidence."""
         score = 0.0
+        if goal_set is None:
+            goal_set = frozenset(profile.health_goals)
         
         # Goal alignment (40% of score)
-        if profile.health_goals:
-            matching_goals = set(product.health_goals) & set(profile.health_goals)
+        if goal_set:
+            matching_goals = product._goals_set & goal_set
             if matching_goals:
-                goal_alignment_score = len(matching_goals) / len(set(profile.health_goals))
+                goal_alignment_score = len(matching_goals) / len(goal_set)
                 score += 0.4 * goal_alignment_score
         
         # Evidence level (30% of score)
-        evidence_scores = {"high": 0.3, "moderate": 0.2, "low": 0.1}
-        score += evidence_scores.get(product.evidence_level, 0.1)
+        score += self._EVIDENCE_SCORES.get(product.evidence_level, 0.1)
         
         # Quality score (30% of score)
         score += 0.3 * product.quality_score
         
         return min(1.0, score)
 
-    def _generate_rationale(self, product: Product, profile: UserHealthProfile) -> str:
+    def _generate_rationale(self, product: Product, profile: UserHealthProfile,
+                            goal_set: Optional[frozenset] = None) -> str:
         """Generate evidence-based rationale for recommendation."""
         rationale_parts = []
+        if goal_set is None:
+            goal_set = frozenset(profile.health_goals)
         
         # Goal alignment
-        matching_goals = set(product.health_goals) & set(profile.health_goals)
+        matching_goals = product._goals_set & goal_set
         if matching_goals:
             rationale_parts.append(f"Supports your goals: {', '.join(matching_goals)}")
         
@@ -373,19 +578,5 @@ class ProductCuratorAgent(BaseAgent):
         return ". ".join(rationale_parts) if rationale_parts else "General wellness support"
 
     def _generate_safety_warnings(self, product: Product) -> List[str]:
-        """Generate comprehensive safety warnings."""
-        warnings = []
-        
-        if product.contraindications:
-            warnings.append(f"Not recommended if you have: {', '.join(product.contraindications)}")
-        
-        if product.interactions:
-            warnings.append(f"May interact with: {', '.join(product.interactions)}")
-        
-        if product.allergens:
-            warnings.append(f"Contains: {', '.join(product.allergens)}")
-        
-        warnings.append("Consult healthcare provider before starting new supplements")
-        
-        # Remove any empty warnings
-        return [w for w in warnings if w and w.strip()]
\ No newline at end of file
+        """Generate comprehensive safety warnings (precomputed per product)."""
+        return list(product._warnings)
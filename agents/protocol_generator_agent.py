@@ -1,8 +1,10 @@
+import asyncio
+import hashlib
 import os
 from typing import Any, Dict, Optional, List
 from dataclasses import dataclass
 from loguru import logger
-from openai import OpenAI
+from openai import AsyncOpenAI
 
 from agents.base import BaseAgent, AgentConfig
 from common.event_bus import Event
@@ -10,7 +12,8 @@ from common.rag.retriever import HybridRetriever
 from common.persistence.vector_client import VectorClient
 from common.persistence.graph_client import GraphClient
 from common.privacy.audit import audit_event
-from common.privacy.consent import consent_store
+from common.llm_client import shared_openai_client
+from common.ttl_cache import TTLCache
 
 JsonDict = Dict[str, Any]
 
@@ -22,26 +25,33 @@ class ProtocolConfig:
 
 
 class ProtocolGeneratorAgent(BaseAgent):
-    def __init__(self, bus):
+    # Completions for prompts without user context are shared across users for this long
+    COMPLETION_CACHE_TTL_SECONDS = 3600.0
+    COMPLETION_CACHE_SIZE = 1024
+
+    def __init__(self, bus, client: Optional[AsyncOpenAI] = None):
         super().__init__(AgentConfig(
             name="protocol_generator_agent",
-            subscribe_topics=["protocol.generate.requested"]
+            subscribe_topics=["protocol.generate.requested", "consent.changed"]
         ), bus)
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY", ""))
+        self.client = client or shared_openai_client()
         self.retriever = HybridRetriever(VectorClient(), GraphClient())
         self.protocol_config = ProtocolConfig()
+        self._completion_cache = TTLCache(self.COMPLETION_CACHE_SIZE, self.COMPLETION_CACHE_TTL_SECONDS)
 
     async def _consent_guard(self, event: Event) -> bool:
         if not event.user_id:
             return True
-        return consent_store.check(event.user_id, "personalization")
+        return self._check_consent(event.user_id, "personalization")
 
     async def handle(self, event: Event) -> None:
         user_id = event.user_id or "unknown"
         user_context_ref = event.payload.get("user_context_ref")
         # For demonstration, we simulate embeddings; production uses a real embedding model
         dummy_embedding = [0.01] * 1536
-        refs = self.retriever.retrieve(self.protocol_config.namespace, dummy_embedding, graph_node_id=None, k=self.protocol_config.max_references)
+        # Retrieval does blocking pgvector/Neo4j I/O; keep it off the event loop
+        refs = await asyncio.to_thread(self.retriever.retrieve, self.protocol_config.namespace, dummy_embedding,
+                                       graph_node_id=None, k=self.protocol_config.max_references)
         content_refs = "\n".join([f"- {r.get('content')[:200]}" for r in refs])
 
         prompt = f"""
@@ -57,17 +67,27 @@ Requirements:
 - Add this exact disclaimer at the end: "This content is for general wellness only and is not medical advice."
 """
 
-        logger.info(f"Generating protocol for user={user_id}")
-        resp = self.client.chat.completions.create(
-            model=os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
-            messages=[
-                {"role": "system", "content": "You produce safe, compliant wellness guidance."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3,
-            max_tokens=700
-        )
-        text = resp.choices[0].message.content
+        # Only prompts carrying no user context are cached, so nothing personal is shared
+        cache_key = None
+        if user_context_ref is None:
+            cache_key = hashlib.blake2b(prompt.encode(), digest_size=16).digest()
+        text = self._completion_cache.get(cache_key) if cache_key else None
+        if text is not None:
+            logger.info("Reusing cached protocol for user={}", user_id)
+        else:
+            logger.info("Generating protocol for user={}", user_id)
+            resp = await self.client.chat.completions.create(
+                model=os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
+                messages=[
+                    {"role": "system", "content": "You produce safe, compliant wellness guidance."},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.3,
+                max_tokens=700
+            )
+            text = resp.choices[0].message.content
+            if cache_key:
+                self._completion_cache.set(cache_key, text)
 
         # Ensure disclaimer
         disclaimer = "This content is for general wellness only and is not medical advice."
@@ -1,15 +1,33 @@
 from typing import Any, Dict, Optional
 from dataclasses import dataclass
 from datetime import datetime
+import numpy as np
 from loguru import logger
 
 from agents.base import BaseAgent, AgentConfig
 from common.event_bus import Event
-from common.privacy.consent import consent_store
 from common.privacy.audit import audit_event
 
 JsonDict = Dict[str, Any]
 
+SIMULATION_DISCLAIMER = "This is a general wellness simulation, not a medical diagnosis or treatment recommendation."
+
+# Bounds on one batch request; the API model enforces the same limits
+MAX_BATCH_SCENARIOS = 1000
+MAX_MINUTES_DELTA = 24 * 60
+
+
+def batch_shape_error(*columns: Any) -> Optional[str]:
+    """Why the scenario columns can't be broadcast into one sweep, or None if they can."""
+    lengths = [len(c) if isinstance(c, list) else 1 for c in columns]
+    if min(lengths) < 1:
+        return "Scenario lists must not be empty"
+    if max(lengths) > MAX_BATCH_SCENARIOS:
+        return f"At most {MAX_BATCH_SCENARIOS} scenarios per batch"
+    if len(set(lengths) - {1}) > 1:
+        return "Scenario lists must have equal length or length 1"
+    return None
+
 
 @dataclass
 class Scenario:
@@ -22,15 +40,18 @@ class VitalitySimulationAgent(BaseAgent):
     def __init__(self, bus):
         super().__init__(AgentConfig(
             name="vitality_simulation_agent",
-            subscribe_topics=["simulation.vitality.requested"]
+            subscribe_topics=["simulation.vitality.requested", "simulation.vitality.batch.requested", "consent.changed"]
         ), bus)
 
     async def _consent_guard(self, event: Event) -> bool:
         if not event.user_id:
             return True
-        return consent_store.check(event.user_id, "personalization")
+        return self._check_consent(event.user_id, "personalization")
 
     async def handle(self, event: Event) -> None:
+        if event.topic == "simulation.vitality.batch.requested":
+            await self._handle_batch(event)
+            return
         user_id = event.user_id or "unknown"
         payload = event.payload or {}
         scenario = Scenario(
@@ -51,7 +72,7 @@ class VitalitySimulationAgent(BaseAgent):
             "estimated_changes": {
                 "hrv": round((new_vitality - base_vitality) * 15.0, 2)
             },
-            "disclaimer": "This is a general wellness simulation, not a medical diagnosis or treatment recommendation."
+            "disclaimer": SIMULATION_DISCLAIMER
         }
 
         audit_event("simulation.vitality.completed", user_id=user_id, details=result, correlation_id=event.correlation_id)
@@ -62,4 +83,80 @@ class VitalitySimulationAgent(BaseAgent):
             payload=result,
             user_id=user_id,
             correlation_id=event.correlation_id
-        )
\ No newline at end of file
+        )
+
+    async def _handle_batch(self, event: Event) -> None:
+        """
+        Simulate a sweep of scenarios in one pass.
+
+        sleep_minutes_delta, activity_minutes_delta and stress_reduction may each be a
+        scalar or a list; they are broadcast against each other, so a grid can be sent
+        as equal-length lists. Uses the same model as the single-scenario handler.
+        """
+        user_id = event.user_id or "unknown"
+        payload = event.payload or {}
+        base_vitality = float(payload.get("current_vitality", 0.6))
+        columns = [payload.get("sleep_minutes_delta", 0), payload.get("activity_minutes_delta", 0),
+                   payload.get("stress_reduction", 0.0)]
+        # Publishers other than the API skip its request model; hold them to the same limits
+        error = batch_shape_error(*columns)
+        if error is None:
+            try:
+                sleep, activity, stress = np.broadcast_arrays(
+                    np.trunc(np.asarray(columns[0], dtype=np.float64)),
+                    np.trunc(np.asarray(columns[1], dtype=np.float64)),
+                    np.asarray(columns[2], dtype=np.float64),
+                )
+            except (TypeError, ValueError) as e:
+                error = f"Scenario values must be numbers: {e}"
+            else:
+                if (np.abs(sleep) > MAX_MINUTES_DELTA).any() or (np.abs(activity) > MAX_MINUTES_DELTA).any():
+                    error = f"Minute deltas must be within ±{MAX_MINUTES_DELTA}"
+                elif ((stress < 0.0) | (stress > 1.0)).any():
+                    error = "stress_reduction values must be between 0 and 1"
+        if error is not None:
+            await self._reject_batch(event, user_id, error)
+            return
+        new_vitality = np.clip(base_vitality + (sleep / 60.0) * 0.05 + (activity / 60.0) * 0.05 + stress * 0.07, 0.0, 1.0)
+        hrv = (new_vitality - base_vitality) * 15.0
+
+        scenarios = [
+            {
+                "sleep_minutes_delta": int(s),
+                "activity_minutes_delta": int(a),
+                "stress_reduction": r,
+                "new_vitality": round(v, 3),
+                "estimated_changes": {"hrv": round(h, 2)}
+            }
+            for s, a, r, v, h in zip(sleep.ravel().tolist(), activity.ravel().tolist(), stress.ravel().tolist(),
+                                     new_vitality.ravel().tolist(), hrv.ravel().tolist())
+        ]
+        result = {
+            "user_id": user_id,
+            "baseline_vitality": base_vitality,
+            "scenarios": scenarios,
+            "disclaimer": SIMULATION_DISCLAIMER
+        }
+
+        audit_event("simulation.vitality.batch_completed", user_id=user_id,
+                    details={"baseline_vitality": base_vitality, "scenario_count": len(scenarios)},
+                    correlation_id=event.correlation_id)
+
+        await self.publish(
+            topic="simulation.vitality.completed",
+            event_type="simulation.batch.completed",
+            payload=result,
+            user_id=user_id,
+            correlation_id=event.correlation_id
+        )
+
+    async def _reject_batch(self, event: Event, user_id: str, error: str) -> None:
+        """Answer a malformed batch request with a failure event instead of dropping it."""
+        logger.warning(f"Rejected vitality batch correlation_id={event.correlation_id}: {error}")
+        await self.publish(
+            topic="simulation.vitality.completed",
+            event_type="simulation.batch.failed",
+            payload={"user_id": user_id, "error": error, "disclaimer": SIMULATION_DISCLAIMER},
+            user_id=user_id,
+            correlation_id=event.correlation_id
+        )
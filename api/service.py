@@ -1,13 +1,16 @@
 import asyncio
 import os
-from typing import Any, Dict, Optional, List
+from typing import Annotated, Any, Awaitable, Callable, Dict, Optional, List, Set
 from contextlib import asynccontextmanager
 from datetime import datetime
 
+import orjson
 import uvicorn
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Depends, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
+from fastapi.responses import ORJSONResponse, Response
+from pydantic import BaseModel, Field, model_validator
+from websockets.exceptions import ConnectionClosed
 from loguru import logger
 from opentelemetry import trace
 from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
@@ -21,7 +24,7 @@ from agents.orchestrator import Orchestrator
 from agents.data_ingestion_agent import DataIngestionAgent
 from agents.knowledge_graph_agent import KnowledgeGraphAgent
 from agents.digital_twin_agent import DigitalTwinAgent
-from agents.vitality_simulation_agent import VitalitySimulationAgent
+from agents.vitality_simulation_agent import MAX_BATCH_SCENARIOS, MAX_MINUTES_DELTA, VitalitySimulationAgent, batch_shape_error
 from agents.protocol_generator_agent import ProtocolGeneratorAgent
 from agents.practitioner_oversight_agent import PractitionerOversightAgent
 from agents.compliance_guardian_agent import ComplianceGuardianAgent
@@ -30,7 +33,8 @@ from integrations.spike_service import router as spike_router, attach_bus as att
 from integrations.omnos_connector import OmnosConnector
 from integrations.questionnaire_processor import QuestionnaireProcessor
 from common.privacy.consent import consent_store
-from common.privacy.audit import audit_event
+from common.privacy.audit import audit_event, flush_audit
+from common.llm_client import close_shared_openai_client
 
 JsonDict = Dict[str, Any]
 
@@ -51,6 +55,28 @@ class SimulationRequest(BaseModel):
     current_vitality: float = Field(0.6, ge=0.0, le=1.0, description="Current vitality score")
 
 
+MinutesDelta = Annotated[int, Field(ge=-MAX_MINUTES_DELTA, le=MAX_MINUTES_DELTA)]
+StressReduction = Annotated[float, Field(ge=0.0, le=1.0)]
+
+
+class BatchSimulationRequest(BaseModel):
+    user_id: str = Field(..., description="User ID")
+    sleep_minutes_delta: List[MinutesDelta] = Field(default_factory=lambda: [0], min_length=1, max_length=MAX_BATCH_SCENARIOS,
+                                                    description="Sleep minute changes, one per scenario")
+    activity_minutes_delta: List[MinutesDelta] = Field(default_factory=lambda: [0], min_length=1, max_length=MAX_BATCH_SCENARIOS,
+                                                       description="Activity minute changes, one per scenario")
+    stress_reduction: List[StressReduction] = Field(default_factory=lambda: [0.0], min_length=1, max_length=MAX_BATCH_SCENARIOS,
+                                                    description="Stress reduction factors, one per scenario")
+    current_vitality: float = Field(0.6, ge=0.0, le=1.0, description="Current vitality score")
+
+    @model_validator(mode="after")
+    def _broadcastable(self) -> "BatchSimulationRequest":
+        error = batch_shape_error(self.sleep_minutes_delta, self.activity_minutes_delta, self.stress_reduction)
+        if error:
+            raise ValueError(error)
+        return self
+
+
 class ReviewDecision(BaseModel):
     reviewer: str = Field(..., description="Reviewer identifier")
     action: str = Field(..., description="Action: approve or reject")
@@ -109,7 +135,13 @@ async def lifespan(app: FastAPI):
         logger.info("Agentic platform started")
         yield
     
-    # Shutdown
+    # Shutdown: stop agents first so buffered work is flushed before the bus closes
+    await asyncio.gather(
+        orchestrator.stop(),
+        *[agent.stop() for agent in agents.values()]
+    )
+    await flush_audit()
+    await close_shared_openai_client()
     await bus.stop()
     logger.info("Agentic platform stopped")
 
@@ -118,7 +150,8 @@ async def lifespan(app: FastAPI):
 app = FastAPI(
     title="VitaeX Agentic Platform",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # CORS
@@ -132,8 +165,17 @@ app.add_middleware(
 
 # Observability
 if os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT"):
+    # Sampling follows OTEL_TRACES_SAMPLER / OTEL_TRACES_SAMPLER_ARG (e.g. parentbased_traceidratio)
     provider = TracerProvider()
-    processor = BatchSpanProcessor(OTLPSpanExporter())
+    # Larger queue and shorter delay absorb publish/WebSocket span bursts without drops;
+    # the shorter export timeout keeps shutdown from stalling on a slow collector
+    processor = BatchSpanProcessor(
+        OTLPSpanExporter(),
+        max_queue_size=int(os.getenv("OTEL_BSP_MAX_QUEUE_SIZE", "4096")),
+        schedule_delay_millis=int(os.getenv("OTEL_BSP_SCHEDULE_DELAY", "1000")),
+        max_export_batch_size=int(os.getenv("OTEL_BSP_MAX_EXPORT_BATCH_SIZE", "256")),
+        export_timeout_millis=int(os.getenv("OTEL_BSP_EXPORT_TIMEOUT", "10000")),
+    )
     provider.add_span_processor(processor)
     trace.set_tracer_provider(provider)
     FastAPIInstrumentor.instrument_app(app)
@@ -190,7 +232,7 @@ async def request_research_import():
     if not bus:
         raise HTTPException(status_code=503, detail="Event bus not available")
     
-    correlation_id = await bus.publish(
+    correlation_id = await bus.publish_async(
         topic="knowledge.research.import.requested",
         event_type="research.import.request",
         payload={}
@@ -199,6 +241,17 @@ async def request_research_import():
 
 
 # Consent management endpoints
+async def _publish_consent_changed(user_id: str, purpose: str) -> None:
+    """Let agents on other replicas drop cached consent decisions."""
+    if bus:
+        await bus.publish(
+            topic="consent.changed",
+            event_type="consent.changed",
+            payload={"user_id": user_id, "purpose": purpose},
+            user_id=user_id
+        )
+
+
 @app.post("/consent/grant")
 async def grant_consent(request: ConsentRequest):
     """Grant user consent for specific purpose."""
@@ -213,6 +266,7 @@ async def grant_consent(request: ConsentRequest):
         user_id=request.user_id,
         details={"purpose": request.purpose, "scope": request.scope}
     )
+    await _publish_consent_changed(request.user_id, request.purpose)
     return {"status": "granted"}
 
 
@@ -225,6 +279,7 @@ async def revoke_consent(user_id: str, purpose: str):
         user_id=user_id,
         details={"purpose": purpose}
     )
+    await _publish_consent_changed(user_id, purpose)
     return {"status": "revoked"}
 
 
@@ -252,7 +307,7 @@ async def simulate_vitality(request: SimulationRequest):
     if not bus:
         raise HTTPException(status_code=503, detail="Event bus not available")
     
-    correlation_id = await bus.publish(
+    correlation_id = await bus.publish_async(
         topic="simulation.vitality.requested",
         event_type="simulation.request",
         payload={
@@ -266,6 +321,26 @@ async def simulate_vitality(request: SimulationRequest):
     return {"status": "queued", "correlation_id": correlation_id}
 
 
+@app.post("/simulation/vitality/batch")
+async def simulate_vitality_batch(request: BatchSimulationRequest):
+    """Request a sweep of vitality what-if scenarios; single-element lists are broadcast."""
+    if not bus:
+        raise HTTPException(status_code=503, detail="Event bus not available")
+    
+    correlation_id = await bus.publish_async(
+        topic="simulation.vitality.batch.requested",
+        event_type="simulation.batch.request",
+        payload={
+            "sleep_minutes_delta": request.sleep_minutes_delta,
+            "activity_minutes_delta": request.activity_minutes_delta,
+            "stress_reduction": request.stress_reduction,
+            "current_vitality": request.current_vitality,
+        },
+        user_id=request.user_id
+    )
+    return {"status": "queued", "correlation_id": correlation_id}
+
+
 # Data sync endpoints
 @app.post("/omnos/sync/{user_id}")
 async def sync_omnos(user_id: str):
@@ -307,24 +382,17 @@ async def list_reviews(
         raise HTTPException(status_code=503, detail="Practitioner oversight not available")
     
     oversight_agent = agents["practitioner_oversight"]
-    all_reviews = oversight_agent._reviews.values()
-    
-    # Apply filters
-    filtered = all_reviews
-    if status:
-        filtered = [r for r in filtered if r.status == status]
-    if reviewer:
-        filtered = [r for r in filtered if reviewer in r.reviewers]
+    filtered = oversight_agent.find_reviews(status=status, reviewer=reviewer)
     
     # Convert to response format
     reviews = []
-    for review in list(filtered)[:limit]:
+    for review in filtered[:limit]:
         reviews.append({
             "protocol_id": review.protocol_id,
             "user_id": review.user_id,
             "status": review.status,
             "reviewers_required": review.reviewers_required,
-            "reviewers": review.reviewers,
+            "reviewers": sorted(review.reviewers),
             "approvals": len(review.approvals),
             "rejections": len(review.rejections),
             "updated_at": review.updated_at
@@ -351,17 +419,8 @@ async def get_review(protocol_id: str):
     if not review:
         raise HTTPException(status_code=404, detail="Review not found")
     
-    return {
-        "protocol_id": review.protocol_id,
-        "user_id": review.user_id,
-        "status": review.status,
-        "reviewers_required": review.reviewers_required,
-        "reviewers": review.reviewers,
-        "approvals": review.approvals,
-        "rejections": review.rejections,
-        "comments": review.comments,
-        "updated_at": review.updated_at
-    }
+    # Serialized bytes are cached on the review until it next changes
+    return Response(content=review.to_json(), media_type="application/json")
 
 
 @app.post("/reviews/{protocol_id}/decision")
@@ -405,7 +464,42 @@ async def submit_review_decision(protocol_id: str, decision: ReviewDecision):
 
 
 # WebSocket for real-time collaboration
-connected_peers: Dict[str, List[WebSocket]] = {}
+# Rooms are only mutated by _join_room/_leave_room, which never await, so each
+# mutation is atomic on the event loop; broadcasts iterate over a snapshot.
+connected_peers: Dict[str, Set[WebSocket]] = {}
+
+
+def _join_room(room_id: str, websocket: WebSocket) -> None:
+    connected_peers.setdefault(room_id, set()).add(websocket)
+
+
+def _leave_room(room_id: str, websocket: WebSocket) -> None:
+    peers = connected_peers.get(room_id)
+    if peers is None:
+        return
+    peers.discard(websocket)
+    # Clean up empty rooms
+    if not peers:
+        del connected_peers[room_id]
+
+
+async def _broadcast(room_id: str, sender: WebSocket, send: Callable[[WebSocket], Awaitable[None]]) -> None:
+    """Send to every other peer in the room concurrently; one slow or dead peer doesn't hold up the rest."""
+    peers = [peer for peer in connected_peers.get(room_id, ()) if peer is not sender]
+    if not peers:
+        return
+    results = await asyncio.gather(*(send(peer) for peer in peers), return_exceptions=True)
+    for peer, result in zip(peers, results):
+        if isinstance(result, (WebSocketDisconnect, ConnectionClosed, RuntimeError)):
+            # Closed socket: drop it now instead of failing on it every broadcast
+            _leave_room(room_id, peer)
+        elif isinstance(result, BaseException):
+            logger.warning(f"Broadcast to a peer in room={room_id} failed: {result!r}")
+
+
+def _presence_message(event_type: str) -> str:
+    # Serialized once per event and sent as the same text frame to every peer
+    return orjson.dumps({"type": event_type, "timestamp": datetime.utcnow().isoformat()}).decode()
 
 
 @app.websocket("/ws/collab/{room_id}")
@@ -414,48 +508,26 @@ async def websocket_endpoint(websocket: WebSocket, room_id: str):
     await websocket.accept()
     
     # Add to room
-    if room_id not in connected_peers:
-        connected_peers[room_id] = []
-    connected_peers[room_id].append(websocket)
+    _join_room(room_id, websocket)
     
     # Notify others in room
-    for peer in connected_peers[room_id]:
-        if peer != websocket:
-            try:
-                await peer.send_json({
-                    "type": "user_joined",
-                    "timestamp": datetime.utcnow().isoformat()
-                })
-            except:
-                pass
+    joined = _presence_message("user_joined")
+    await _broadcast(room_id, websocket, lambda peer: peer.send_text(joined))
     
     try:
         while True:
             data = await websocket.receive_text()
             # Broadcast to all peers in the room
-            for peer in connected_peers[room_id]:
-                if peer != websocket:
-                    try:
-                        await peer.send_text(data)
-                    except:
-                        pass
+            await _broadcast(room_id, websocket, lambda peer: peer.send_text(data))
     except WebSocketDisconnect:
-        # Remove from room
-        connected_peers[room_id].remove(websocket)
-        
-        # Notify others
-        for peer in connected_peers[room_id]:
-            try:
-                await peer.send_json({
-                    "type": "user_left",
-                    "timestamp": datetime.utcnow().isoformat()
-                })
-            except:
-                pass
-        
-        # Clean up empty rooms
-        if not connected_peers[room_id]:
-            del connected_peers[room_id]
+        pass
+    finally:
+        # Remove from room however the connection ended
+        _leave_room(room_id, websocket)
+    
+    # Notify others
+    left = _presence_message("user_left")
+    await _broadcast(room_id, websocket, lambda peer: peer.send_text(left))
 
 
 # Product recommendation endpoint
@@ -465,7 +537,7 @@ async def request_product_recommendations(user_id: str):
     if not bus:
         raise HTTPException(status_code=503, detail="Event bus not available")
     
-    correlation_id = await bus.publish(
+    correlation_id = await bus.publish_async(
         topic="product.recommendation.requested",
         event_type="recommendation.request",
         payload={"user_id": user_id},
@@ -482,7 +554,7 @@ async def generate_protocol(user_id: str, context_ref: Optional[str] = None):
     if not bus:
         raise HTTPException(status_code=503, detail="Event bus not available")
     
-    correlation_id = await bus.publish(
+    correlation_id = await bus.publish_async(
         topic="protocol.generate.requested",
         event_type="protocol.request",
         payload={
@@ -500,5 +572,7 @@ if __name__ == "__main__":
         "api.service:app",
         host="0.0.0.0",
         port=int(os.getenv("PORT", "8080")),
+        loop="uvloop",
+        http="httptools",
         reload=True
     )
\ No newline at end of file
@@ -1,16 +1,23 @@
 import os
-from typing import Optional
+import uuid
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 
+import numpy as np
+import orjson
 import uvicorn
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, Response
 from pydantic import BaseModel, Field
 
+from common.ttl_cache import TTLCache
+
 # Simple FastAPI app for cloud deployment
 app = FastAPI(
     title="VitaeX Agentic Platform",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # CORS
@@ -30,14 +37,23 @@ class ConsentRequest(BaseModel):
 
 class SimulationRequest(BaseModel):
     user_id: str = Field(..., description="User ID")
-    sleep_minutes_delta: int = Field(0, description="Change in sleep minutes")
-    activity_minutes_delta: int = Field(0, description="Change in activity minutes")
-    stress_reduction: float = Field(0.0, description="Stress reduction factor")
-    current_vitality: float = Field(0.6, description="Current vitality score")
+    sleep_minutes_delta: int = Field(0, ge=-720, le=720, description="Change in sleep minutes")
+    activity_minutes_delta: int = Field(0, ge=-720, le=720, description="Change in activity minutes")
+    stress_reduction: float = Field(0.0, ge=0.0, le=1.0, description="Stress reduction factor")
+    current_vitality: float = Field(0.6, ge=0.0, le=1.0, description="Current vitality score")
+
+class BatchSimulationRequest(BaseModel):
+    scenarios: List[SimulationRequest] = Field(..., min_length=1, max_length=1000, description="Scenarios to simulate")
 
 # In-memory storage for cloud mode
-consent_store = {}
-simulation_results = {}
+# (user_id, purpose) -> grant; tuple keys avoid building a string per lookup and
+# can't collide the way "user_purpose" strings could when ids contain underscores
+consent_store: Dict[Tuple[str, str], Dict[str, str]] = {}
+PERSONALIZATION = "personalization"
+# Recent simulation results by correlation id; bounded, since one batch call stores up to 1000
+SIMULATION_RESULTS_SIZE = 10_000
+SIMULATION_RESULTS_TTL_SECONDS = 3600.0
+simulation_results = TTLCache(SIMULATION_RESULTS_SIZE, SIMULATION_RESULTS_TTL_SECONDS)
 
 # Health check endpoints
 @app.get("/health")
@@ -59,7 +75,7 @@ async def readiness_check():
 @app.post("/consent/grant")
 async def grant_consent(request: ConsentRequest):
     """Grant user consent for specific purpose."""
-    consent_store[f"{request.user_id}_{request.purpose}"] = {
+    consent_store[(request.user_id, request.purpose)] = {
         "scope": request.scope,
         "granted_at": datetime.utcnow().isoformat()
     }
@@ -68,7 +84,7 @@ async def grant_consent(request: ConsentRequest):
 @app.get("/consent/status")
 async def get_consent_status(user_id: str, purpose: str):
     """Get consent status for user."""
-    has_consent = f"{user_id}_{purpose}" in consent_store
+    has_consent = (user_id, purpose) in consent_store
     return {
         "user_id": user_id,
         "purpose": purpose,
@@ -80,7 +96,7 @@ async def get_consent_status(user_id: str, purpose: str):
 async def generate_protocol(user_id: str, context_ref: Optional[str] = None):
     """Generate personalized wellness protocol."""
     # Check consent
-    has_consent = f"{user_id}_personalization" in consent_store
+    has_consent = (user_id, PERSONALIZATION) in consent_store
     if not has_consent:
         raise HTTPException(status_code=403, detail="Consent required for personalization")
     
@@ -95,24 +111,20 @@ async def generate_protocol(user_id: str, context_ref: Optional[str] = None):
     }
 
 # Vitality simulation
-@app.post("/simulation/vitality")
-async def simulate_vitality(request: SimulationRequest):
-    """Simulate vitality improvements from lifestyle changes."""
-    # Simple vitality calculation
-    base_vitality = request.current_vitality
-    improvement = (
-        (request.sleep_minutes_delta / 60.0) * 0.05 +
-        (request.activity_minutes_delta / 60.0) * 0.03 +
-        request.stress_reduction * 0.07
-    )
-    new_vitality = min(1.0, max(0.0, base_vitality + improvement))
-    
-    correlation_id = f"sim_{request.user_id}_{int(datetime.utcnow().timestamp())}"
-    
-    result = {
+# Improvement per unit of (sleep minutes, activity minutes, stress reduction)
+VITALITY_COEFFS = np.array([0.05 / 60.0, 0.03 / 60.0, 0.07])
+
+def _improvements(scenarios: List[SimulationRequest]) -> np.ndarray:
+    """Vitality improvement per scenario; the one formula shared by the single and batch endpoints."""
+    inputs = np.array([(s.sleep_minutes_delta, s.activity_minutes_delta, s.stress_reduction) for s in scenarios],
+                      dtype=np.float64)
+    return inputs @ VITALITY_COEFFS
+
+def _simulation_result(correlation_id: str, request: SimulationRequest, new_vitality: float, improvement: float) -> dict:
+    return {
         "correlation_id": correlation_id,
         "user_id": request.user_id,
-        "baseline_vitality": base_vitality,
+        "baseline_vitality": request.current_vitality,
         "predicted_vitality": round(new_vitality, 3),
         "improvement": round(improvement, 3),
         "estimated_changes": {
@@ -121,9 +133,22 @@ async def simulate_vitality(request: SimulationRequest):
         },
         "disclaimer": "These are wellness estimates based on research patterns, not medical predictions."
     }
+
+@app.post("/simulation/vitality")
+async def simulate_vitality(request: SimulationRequest):
+    """Simulate vitality improvements from lifestyle changes."""
+    # Simple vitality calculation
+    base_vitality = request.current_vitality
+    improvement = float(_improvements([request])[0])
+    # Inputs are bounds-checked by the model; only the predicted score needs clamping
+    new_vitality = min(1.0, max(0.0, base_vitality + improvement))
+    
+    correlation_id = f"sim_{request.user_id}_{int(datetime.utcnow().timestamp())}"
+    
+    result = _simulation_result(correlation_id, request, new_vitality, improvement)
     
     # Store result
-    simulation_results[correlation_id] = result
+    simulation_results.set(correlation_id, result)
     
     return {
         "status": "completed",
@@ -131,54 +156,85 @@ async def simulate_vitality(request: SimulationRequest):
         "results": result
     }
 
+@app.post("/simulation/vitality/batch")
+async def simulate_vitality_batch(request: BatchSimulationRequest):
+    """Simulate many scenarios in one call; the formula is evaluated as a single matrix product."""
+    scenarios = request.scenarios
+    baseline = np.array([s.current_vitality for s in scenarios], dtype=np.float64)
+    improvement = _improvements(scenarios)
+    new_vitality = np.clip(baseline + improvement, 0.0, 1.0)
+    
+    # Batches usually sweep one user's scenarios, so ids carry the scenario index; the
+    # batch id keeps two batches in the same second from overwriting each other
+    batch_id = f"{int(datetime.utcnow().timestamp())}_{uuid.uuid4().hex[:8]}"
+    results = []
+    for index, (scenario, vitality, delta) in enumerate(zip(scenarios, new_vitality.tolist(), improvement.tolist())):
+        correlation_id = f"sim_{scenario.user_id}_{batch_id}_{index}"
+        result = _simulation_result(correlation_id, scenario, vitality, delta)
+        simulation_results.set(correlation_id, result)
+        results.append(result)
+    
+    return {
+        "status": "completed",
+        "count": len(results),
+        "results": results
+    }
+
 # Product recommendations
+# Simple evidence-based recommendations; identical for every user in cloud mode
+_STATIC_RECOMMENDATIONS = [
+    {
+        "id": "vitamin_d3",
+        "name": "Vitamin D3 5000 IU",
+        "category": "supplement",
+        "rationale": "Supports immune function and bone health based on research evidence",
+        "evidence_level": "high",
+        "quality_score": 0.9,
+        "safety_warnings": ["Consult healthcare provider before use"]
+    },
+    {
+        "id": "omega_3",
+        "name": "Omega-3 EPA/DHA",
+        "category": "supplement",
+        "rationale": "Supports cardiovascular and brain health with strong research backing",
+        "evidence_level": "high",
+        "quality_score": 0.85,
+        "safety_warnings": ["May interact with blood thinners", "Consult healthcare provider"]
+    },
+    {
+        "id": "magnesium",
+        "name": "Magnesium Glycinate",
+        "category": "supplement",
+        "rationale": "Supports sleep quality and stress management",
+        "evidence_level": "moderate",
+        "quality_score": 0.8,
+        "safety_warnings": ["Start with lower dose", "Consult healthcare provider"]
+    }
+]
+
+_RECOMMENDATIONS_DISCLAIMER = "These wellness suggestions are not medical advice. Consult with healthcare professionals before starting supplements."
+
+# The response is serialized once; only the (JSON-escaped) correlation id is spliced in per request
+_RECOMMENDATIONS_PREFIX = b'{"status":"completed","correlation_id":'
+_RECOMMENDATIONS_SUFFIX = b',' + orjson.dumps({
+    "suggestions": _STATIC_RECOMMENDATIONS,
+    "disclaimer": _RECOMMENDATIONS_DISCLAIMER
+})[1:]
+
 @app.post("/products/recommend/{user_id}")
 async def request_product_recommendations(user_id: str):
     """Get personalized product recommendations."""
     # Check consent
-    has_consent = f"{user_id}_personalization" in consent_store
+    has_consent = (user_id, PERSONALIZATION) in consent_store
     if not has_consent:
         raise HTTPException(status_code=403, detail="Consent required for personalization")
     
-    # Simple evidence-based recommendations  
-    recommendations = [
-        {
-            "id": "vitamin_d3",
-            "name": "Vitamin D3 5000 IU",
-            "category": "supplement",
-            "rationale": "Supports immune function and bone health based on research evidence",
-            "evidence_level": "high",
-            "quality_score": 0.9,
-            "safety_warnings": ["Consult healthcare provider before use"]
-        },
-        {
-            "id": "omega_3",
-            "name": "Omega-3 EPA/DHA",
-            "category": "supplement", 
-            "rationale": "Supports cardiovascular and brain health with strong research backing",
-            "evidence_level": "high",
-            "quality_score": 0.85,
-            "safety_warnings": ["May interact with blood thinners", "Consult healthcare provider"]
-        },
-        {
-            "id": "magnesium",
-            "name": "Magnesium Glycinate",
-            "category": "supplement",
-            "rationale": "Supports sleep quality and stress management",
-            "evidence_level": "moderate",
-            "quality_score": 0.8,
-            "safety_warnings": ["Start with lower dose", "Consult healthcare provider"]
-        }
-    ]
-    
     correlation_id = f"products_{user_id}_{int(datetime.utcnow().timestamp())}"
     
-    return {
-        "status": "completed",
-        "correlation_id": correlation_id,
-        "suggestions": recommendations,
-        "disclaimer": "These wellness suggestions are not medical advice. Consult with healthcare professionals before starting supplements."
-    }
+    return Response(
+        content=_RECOMMENDATIONS_PREFIX + orjson.dumps(correlation_id) + _RECOMMENDATIONS_SUFFIX,
+        media_type="application/json"
+    )
 
 # Basic practitioner endpoints
 @app.get("/reviews")
@@ -195,5 +251,7 @@ if __name__ == "__main__":
         "api.simple_service:app",
         host="0.0.0.0",
         port=int(os.getenv("PORT", "8080")),
+        loop="uvloop",
+        http="httptools",
         reload=False
     )
\ No newline at end of file
@@ -1,37 +1,139 @@
 import asyncio
-import json
 import os
 import signal
 import uuid
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from typing import Any, Awaitable, Callable, Dict, Optional, List
 
+import orjson
 from aiokafka import AIOKafkaProducer, AIOKafkaConsumer
+from aiokafka.admin import AIOKafkaAdminClient, NewTopic
+from aiokafka.errors import ConsumerStoppedError, KafkaError
 from loguru import logger
 
 JsonDict = Dict[str, Any]
+
+# Every topic the platform produces to or consumes from (see scripts/create-kafka-topics.sh).
+# Messages are keyed by user_id, so partitions bound consumer parallelism per topic;
+# size the per-user topics (twin, simulation, protocol) generously, e.g. --partitions 24.
+VALID_TOPICS = frozenset({
+    "ingest.wearables.raw",
+    "ingest.wearables.standardized",
+    "ingest.labs.raw",
+    "ingest.labs.standardized",
+    "ingest.labs.standardization.requested",
+    "ingest.questionnaire.standardized",
+    "ingest.dlq",
+    "knowledge.research.import.requested",
+    "knowledge.research.import.completed",
+    "knowledge.graph.updated",
+    "user.twin.update.requested",
+    "user.twin.updated",
+    "simulation.vitality.requested",
+    "simulation.vitality.batch.requested",
+    "simulation.vitality.completed",
+    "protocol.generate.requested",
+    "protocol.generated",
+    "protocol.review.requested",
+    "protocol.review.updated",
+    "product.recommendation.requested",
+    "product.recommendations",
+    "compliance.alert",
+    "audit.events",
+    "consent.changed",
+})
 EventHandler = Callable[[JsonDict], Awaitable[None]]
+BatchEventHandler = Callable[[List[JsonDict]], Awaitable[None]]
+
+
+def _utc_now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
 
-@dataclass
+@dataclass(slots=True)
 class Event:
     topic: str
     type: str
     payload: JsonDict
     user_id: Optional[str] = None
     correlation_id: Optional[str] = None
-    timestamp: str = datetime.now(timezone.utc).isoformat()
+    # Stamped per instance at construction
+    timestamp: str = field(default_factory=_utc_now_iso)
+
+    def as_dict(self) -> JsonDict:
+        # Hand-written equivalent of asdict(); no field reflection or deepcopy of the payload
+        return {
+            "topic": self.topic,
+            "type": self.type,
+            "payload": self.payload,
+            "user_id": self.user_id,
+            "correlation_id": self.correlation_id,
+            "timestamp": self.timestamp,
+        }
 
     def to_bytes(self) -> bytes:
-        return json.dumps(asdict(self), separators=(",", ":"), default=str).encode("utf-8")
+        # NumPy scalars and arrays serialize as numbers, as they did under stdlib json
+        return orjson.dumps(self.as_dict(), default=str, option=orjson.OPT_SERIALIZE_NUMPY)
 
     @staticmethod
     def from_bytes(data: bytes) -> "Event":
-        obj = json.loads(data.decode("utf-8"))
+        obj = orjson.loads(data)
         return Event(**obj)
 
+    @staticmethod
+    def view(data: JsonDict) -> "EventView":
+        """Wrap a decoded event dict without copying or validating it."""
+        return EventView(data)
+
+
+class EventView:
+    """
+    Read-only, attribute-style access to an event dict held by reference.
+
+    Used on the consume hot path in place of Event(**data); build a full Event
+    only where a validated copy is needed (DLQ, persistence).
+    """
+    __slots__ = ("_data",)
+
+    def __init__(self, data: JsonDict):
+        self._data = data
+
+    @property
+    def topic(self) -> str:
+        return self._data["topic"]
+
+    @property
+    def type(self) -> str:
+        return self._data["type"]
+
+    @property
+    def payload(self) -> JsonDict:
+        return self._data["payload"]
+
+    @property
+    def user_id(self) -> Optional[str]:
+        return self._data.get("user_id")
+
+    @property
+    def correlation_id(self) -> Optional[str]:
+        return self._data.get("correlation_id")
+
+    @property
+    def timestamp(self) -> Optional[str]:
+        return self._data.get("timestamp")
+
+    def as_dict(self) -> JsonDict:
+        return self._data
+
+    def to_event(self) -> Event:
+        return Event(**self._data)
+
 
 class EventBus:
+    PRODUCER_LINGER_MS = 10
+    PRODUCER_MAX_BATCH_BYTES = 262144
+
     def __init__(self, bootstrap_servers: Optional[str] = None, consumer_group: str = "vitaex-agents"):
         self.bootstrap_servers = bootstrap_servers or os.getenv("KAFKA_BOOTSTRAP_SERVERS", "localhost:9092")
         self.consumer_group = consumer_group
@@ -42,11 +144,37 @@ class EventBus:
 
     async def start(self) -> None:
         logger.info("Starting EventBus", bootstrap=self.bootstrap_servers)
-        self._producer = AIOKafkaProducer(bootstrap_servers=self.bootstrap_servers, value_serializer=lambda v: v)
+        if os.getenv("KAFKA_AUTO_CREATE_TOPICS", "false").lower() in ("1", "true", "yes"):
+            await self.ensure_topics()
+        # linger_ms lets concurrent publishes share a produce request; lz4 keeps batches small on the wire.
+        # Idempotence (which requires acks="all") stops producer retries from writing duplicates.
+        self._producer = AIOKafkaProducer(
+            bootstrap_servers=self.bootstrap_servers,
+            value_serializer=lambda v: v,
+            linger_ms=self.PRODUCER_LINGER_MS,
+            max_batch_size=self.PRODUCER_MAX_BATCH_BYTES,
+            compression_type="lz4",
+            acks="all",
+            enable_idempotence=True,
+        )
         await self._producer.start()
         self._run = True
         self._register_signals()
 
+    async def ensure_topics(self, num_partitions: int = 24, replication_factor: int = 1) -> None:
+        """Create any of VALID_TOPICS missing on the cluster; existing topics are left untouched."""
+        admin = AIOKafkaAdminClient(bootstrap_servers=self.bootstrap_servers)
+        await admin.start()
+        try:
+            missing = VALID_TOPICS - set(await admin.list_topics())
+            if missing:
+                await admin.create_topics([NewTopic(name=topic, num_partitions=num_partitions,
+                                                    replication_factor=replication_factor)
+                                           for topic in sorted(missing)])
+                logger.info(f"Created Kafka topics: {sorted(missing)}")
+        finally:
+            await admin.close()
+
     def _register_signals(self) -> None:
         loop = asyncio.get_running_loop()
         for sig in (signal.SIGINT, signal.SIGTERM):
@@ -72,51 +200,152 @@ class EventBus:
 
     async def publish(self, topic: str, event_type: str, payload: JsonDict, user_id: Optional[str] = None,
                       correlation_id: Optional[str] = None) -> str:
+        """Publish and wait for the broker ack."""
+        corr, delivery = await self._send(topic, event_type, payload, user_id, correlation_id)
+        await delivery
+        logger.debug("Published event {} to {} correlation_id={}", event_type, topic, corr)
+        return corr
+
+    async def publish_async(self, topic: str, event_type: str, payload: JsonDict, user_id: Optional[str] = None,
+                            correlation_id: Optional[str] = None) -> str:
+        """
+        Enqueue on the producer and return without waiting for the broker ack, so the
+        message rides the next linger batch. Delivery failures are logged, not raised.
+        """
+        corr, delivery = await self._send(topic, event_type, payload, user_id, correlation_id)
+        delivery.add_done_callback(lambda fut: self._log_delivery(fut, event_type, topic, corr))
+        return corr
+
+    async def _send(self, topic: str, event_type: str, payload: JsonDict, user_id: Optional[str],
+                    correlation_id: Optional[str]) -> tuple[str, asyncio.Future]:
+        if topic not in VALID_TOPICS:
+            raise ValueError(f"Unknown topic {topic}")
         if not self._producer:
             raise RuntimeError("Producer not started")
         corr = correlation_id or str(uuid.uuid4())
         event = Event(topic=topic, type=event_type, payload=payload, user_id=user_id, correlation_id=corr)
-        await self._producer.send_and_wait(topic, event.to_bytes())
-        logger.debug(f"Published event {event.type} to {topic} correlation_id={corr}")
-        return corr
+        # Keyed by user so each user's events stay ordered on one partition while
+        # partitions spread users across consumers; user-less events key by correlation id
+        key = (user_id or corr).encode()
+        # send() only waits for buffer space; the returned future resolves on broker ack
+        return corr, await self._producer.send(topic, event.to_bytes(), key=key)
+
+    @staticmethod
+    def _log_delivery(fut: asyncio.Future, event_type: str, topic: str, corr: str) -> None:
+        if fut.cancelled():
+            logger.error("Delivery of event {} to {} cancelled correlation_id={}", event_type, topic, corr)
+        elif fut.exception() is not None:
+            logger.error("Delivery of event {} to {} failed correlation_id={}: {}", event_type, topic, corr, fut.exception())
+        else:
+            logger.debug("Published event {} to {} correlation_id={}", event_type, topic, corr)
+
+    async def subscribe(self, topic: str, handler: EventHandler, pattern: bool = False,
+                        concurrency: int = 16, broadcast: bool = False) -> None:
+        """
+        Subscribe with per-message delivery. Up to concurrency handlers run at once;
+        messages sharing a key (user) still run one after another, in offset order.
+
+        broadcast joins a consumer group of its own, so this subscriber sees every
+        message instead of sharing the topic's partitions with the rest of the group.
+        """
+        await self._subscribe(
+            topic,
+            lambda consumer, group: self._consume_loop(consumer, handler, topic, group, concurrency),
+            broadcast
+        )
+
+    async def subscribe_batch(self, topic: str, handler: BatchEventHandler, max_records: int = 64,
+                              timeout_ms: int = 100) -> None:
+        """
+        Subscribe with micro-batched delivery: handler receives every record fetched in one
+        poll (up to max_records) as a list, so per-message dispatch cost is paid once per batch.
+        timeout_ms only bounds an idle poll; available records are returned immediately.
+        """
+        await self._subscribe(
+            topic,
+            lambda consumer, group: self._consume_batches(consumer, handler, topic, group, max_records, timeout_ms)
+        )
 
-    async def subscribe(self, topic: str, handler: EventHandler, pattern: bool = False) -> None:
+    async def _subscribe(self, topic: str, start_loop: Callable[[AIOKafkaConsumer, str], Awaitable[None]],
+                         broadcast: bool = False) -> None:
+        group = f"{self.consumer_group}-{uuid.uuid4().hex}" if broadcast else self.consumer_group
         consumer = AIOKafkaConsumer(
             topic,
             bootstrap_servers=self.bootstrap_servers,
-            group_id=self.consumer_group,
+            group_id=group,
             value_deserializer=lambda v: v,
-            enable_auto_commit=True,
+            # Offsets are committed once a fetch is fully handled (at-least-once)
+            enable_auto_commit=False,
             auto_offset_reset="latest",
         )
         await consumer.start()
         self._consumers.append(consumer)
-        asyncio.create_task(self._consume_loop(consumer, handler, topic))
+        asyncio.create_task(start_loop(consumer, group))
 
-    async def _consume_loop(self, consumer: AIOKafkaConsumer, handler: EventHandler, topic: str) -> None:
-        logger.info(f"Consuming topic={topic} group={self.consumer_group}")
-        async for msg in consumer:
+    async def _consume_loop(self, consumer: AIOKafkaConsumer, handler: EventHandler, topic: str, group: str,
+                            concurrency: int) -> None:
+        logger.info(f"Consuming topic={topic} group={group} concurrency={concurrency}")
+        slots = asyncio.Semaphore(concurrency)
+        while True:
             try:
-                evt = Event.from_bytes(msg.value)
-                await handler(asdict(evt))
+                records = await consumer.getmany(timeout_ms=100)
+            except ConsumerStoppedError:
+                break
+            tasks: List[asyncio.Task] = []
+            tails: Dict[bytes, asyncio.Task] = {}  # key -> its latest task in this fetch
+            for messages in records.values():
+                for msg in messages:
+                    await slots.acquire()
+                    task = asyncio.create_task(self._dispatch(handler, msg.value, topic, slots, tails.get(msg.key)))
+                    if msg.key is not None:
+                        tails[msg.key] = task
+                    tasks.append(task)
+            if tasks:
+                await asyncio.gather(*tasks)
+                await self._commit(consumer, topic)
+
+    @staticmethod
+    async def _dispatch(handler: EventHandler, value: bytes, topic: str, slots: asyncio.Semaphore,
+                        previous: Optional[asyncio.Task]) -> None:
+        try:
+            if previous is not None:
+                await previous
+            await handler(orjson.loads(value))
+        except Exception as e:
+            logger.exception(f"Error handling message on topic={topic}: {e}")
+        finally:
+            slots.release()
+
+    @staticmethod
+    async def _commit(consumer: AIOKafkaConsumer, topic: str) -> None:
+        try:
+            await consumer.commit()
+        except KafkaError as e:
+            # e.g. partitions revoked mid-fetch; the next owner re-delivers from the last commit
+            logger.warning(f"Offset commit failed on topic={topic}: {e}")
+
+    async def _consume_batches(self, consumer: AIOKafkaConsumer, handler: BatchEventHandler, topic: str, group: str,
+                               max_records: int, timeout_ms: int) -> None:
+        logger.info(f"Consuming topic={topic} group={group} batched max_records={max_records}")
+        while True:
+            try:
+                records = await consumer.getmany(timeout_ms=timeout_ms, max_records=max_records)
+            except ConsumerStoppedError:
+                break
+            batch: List[JsonDict] = []
+            for messages in records.values():
+                for msg in messages:
+                    try:
+                        batch.append(orjson.loads(msg.value))
+                    except orjson.JSONDecodeError as e:
+                        logger.error(f"Dropping undecodable message on topic={topic}: {e}")
+            if not batch:
+                continue
+            try:
+                await handler(batch)
             except Exception as e:
-                logger.exception(f"Error handling message on topic={topic}: {e}")
+                logger.exception(f"Error handling batch of {len(batch)} on topic={topic}: {e}")
+            await self._commit(consumer, topic)
 
     async def wait_until_stopped(self) -> None:
         await self._stop_event.wait()
-
-
-# Recommended Kafka topics for this platform (create them externally or via IaC):
-# - ingest.wearables.raw
-# - ingest.wearables.standardized
-# - ingest.labs.raw
-# - ingest.labs.standardized
-# - knowledge.research.import.requested
-# - knowledge.research.import.completed
-# - knowledge.graph.updated
-# - user.twin.updated
-# - simulation.vitality.completed
-# - protocol.generated
-# - protocol.review.requested
-# - protocol.review.updated
-# - compliance.alert
\ No newline at end of file
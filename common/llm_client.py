@@ -0,0 +1,34 @@
+import os
+from typing import Optional
+
+import httpx
+from openai import AsyncOpenAI
+
+# One keep-alive pool for every agent talking to OpenAI, so TLS handshakes are
+# paid once per connection rather than once per agent instance
+OPENAI_MAX_CONNECTIONS = 100
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = 50
+OPENAI_TIMEOUT_SECONDS = 30.0
+
+_shared_client: Optional[AsyncOpenAI] = None
+
+
+def shared_openai_client() -> AsyncOpenAI:
+    """Process-wide AsyncOpenAI client, created on first use."""
+    global _shared_client
+    if _shared_client is None:
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=OPENAI_MAX_CONNECTIONS,
+                                max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS),
+            timeout=OPENAI_TIMEOUT_SECONDS,
+        )
+        _shared_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY", ""), http_client=http_client)
+    return _shared_client
+
+
+async def close_shared_openai_client() -> None:
+    """Close the shared client's connection pool; the next call creates a fresh one."""
+    global _shared_client
+    if _shared_client is not None:
+        client, _shared_client = _shared_client, None
+        await client.close()
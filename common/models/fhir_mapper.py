@@ -1,23 +1,47 @@
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 JsonDict = Dict[str, Any]
 
+# Constant sub-objects shared by every observation; treat them as read-only
+_OBSERVATION_CATEGORY_SYSTEM = "http://terminology.hl7.org/CodeSystem/observation-category"
+_VITAL_SIGNS_CATEGORY = ({"coding": ({"system": _OBSERVATION_CATEGORY_SYSTEM, "code": "vital-signs"},)},)
+_LABORATORY_CATEGORY = ({"coding": ({"system": _OBSERVATION_CATEGORY_SYSTEM, "code": "laboratory"},)},)
 
-def wearable_to_fhir_observation(user_id: str, metric: str, ts: str, value: float, unit: Optional[str] = None,
-                                 device: Optional[str] = None, meta: Optional[JsonDict] = None) -> JsonDict:
-    observation = {
+
+def _wearable_observation(subject: JsonDict, metric: str, ts: str, value: float, unit: Optional[str],
+                          device: Optional[str], meta: Optional[JsonDict]) -> JsonDict:
+    return {
         "resourceType": "Observation",
         "status": "final",
-        "category": [{"coding": [{"system": "http://terminology.hl7.org/CodeSystem/observation-category", "code": "vital-signs"}]}],
+        "category": _VITAL_SIGNS_CATEGORY,
         "code": {"text": metric},
-        "subject": {"reference": f"Patient/{user_id}"},
+        "subject": subject,
         "effectiveDateTime": ts,
         "valueQuantity": {"value": value, "unit": unit or "unit"},
         "device": {"display": device or "unknown"},
         "meta": meta or {}
     }
-    return observation
+
+
+def wearable_to_fhir_observation(user_id: str, metric: str, ts: str, value: float, unit: Optional[str] = None,
+                                 device: Optional[str] = None, meta: Optional[JsonDict] = None) -> JsonDict:
+    return _wearable_observation({"reference": f"Patient/{user_id}"}, metric, ts, value, unit, device, meta)
+
+
+def wearables_to_fhir_observations(records: List[Tuple[str, str, str, float, Optional[str], Optional[str]]]) -> List[JsonDict]:
+    """
+    Batch form of wearable_to_fhir_observation for (user_id, metric, ts, value, unit, device)
+    records. Observations for the same user share one subject dict.
+    """
+    subjects: Dict[str, JsonDict] = {}
+    observations = []
+    for user_id, metric, ts, value, unit, device in records:
+        subject = subjects.get(user_id)
+        if subject is None:
+            subject = subjects[user_id] = {"reference": f"Patient/{user_id}"}
+        observations.append(_wearable_observation(subject, metric, ts, value, unit, device, None))
+    return observations
 
 
 def lab_to_fhir_observation(user_id: str, analyte: str, ts: str, value: float, unit: Optional[str] = None,
@@ -25,7 +49,7 @@ def lab_to_fhir_observation(user_id: str, analyte: str, ts: str, value: float, u
     return {
         "resourceType": "Observation",
         "status": "final",
-        "category": [{"coding": [{"system": "http://terminology.hl7.org/CodeSystem/observation-category", "code": "laboratory"}]}],
+        "category": _LABORATORY_CATEGORY,
         "code": {"text": analyte},
         "subject": {"reference": f"Patient/{user_id}"},
         "effectiveDateTime": ts,
@@ -102,11 +102,11 @@ def fhir_observation_to_omop_measurement(observation: JsonDict) -> JsonDict:
     
     if ts:
         try:
-            dt = datetime.fromisoformat(ts.replace('Z', '+00:00'))
+            dt = datetime.fromisoformat(ts)  # 3.11+ parses a trailing 'Z' natively
             measurement_datetime = dt.isoformat()
             measurement_date = dt.date().isoformat()
             measurement_time = dt.time().isoformat()
-        except (ValueError, AttributeError):
+        except (ValueError, TypeError):
             measurement_datetime = ts
     
     # Build OMOP measurement record
@@ -166,10 +166,10 @@ def fhir_observation_to_omop_observation(observation: JsonDict) -> JsonDict:
     
     if ts:
         try:
-            dt = datetime.fromisoformat(ts.replace('Z', '+00:00'))
+            dt = datetime.fromisoformat(ts)  # 3.11+ parses a trailing 'Z' natively
             observation_datetime = dt.isoformat()
             observation_date = dt.date().isoformat()
-        except (ValueError, AttributeError):
+        except (ValueError, TypeError):
             observation_datetime = ts
     
     # Determine observation type
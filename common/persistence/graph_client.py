@@ -1,83 +1,264 @@
 import os
-from typing import Dict, Any, List, Tuple, Optional
-from neo4j import GraphDatabase
+import re
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, List, Tuple, Optional
+from neo4j import GraphDatabase, READ_ACCESS, WRITE_ACCESS
+from neo4j.exceptions import ClientError
+import numpy as np
 from loguru import logger
 
 JsonDict = Dict[str, Any]
 
+# Nodes of the same group whose embeddings are at least this cosine-similar are one entity
+DEDUP_SIMILARITY = 0.85
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def _normalize_label(label: Optional[str]) -> str:
+    return _NON_WORD.sub(" ", (label or "").casefold()).strip()
+
+
+def dedupe_nodes(nodes: List[JsonDict]) -> Tuple[List[JsonDict], Dict[str, str]]:
+    """
+    Collapse duplicate entities before they reach Neo4j.
+
+    Stage 1 keys nodes on (group, normalized label); stage 2 merges remaining nodes of a
+    group whose "embedding" vectors (when extractors supply them) reach DEDUP_SIMILARITY.
+    Returns the canonical nodes, in first-seen order, and a duplicate id -> canonical id map.
+    """
+    canonical: Dict[str, JsonDict] = {}
+    alias: Dict[str, str] = {}
+    by_key: Dict[Tuple[Any, str], str] = {}
+    for node in nodes:
+        node_id = node["id"]
+        if node_id in canonical or node_id in alias:
+            continue
+        label = _normalize_label(node.get("label"))
+        key = (node.get("group"), label)
+        if label and key in by_key:
+            alias[node_id] = by_key[key]
+            continue
+        by_key[key] = node_id
+        canonical[node_id] = node
+
+    embedded: Dict[Any, List[str]] = {}
+    for node_id, node in canonical.items():
+        if node.get("embedding"):
+            embedded.setdefault(node.get("group"), []).append(node_id)
+    for ids in embedded.values():
+        if len(ids) < 2:
+            continue
+        vectors = np.asarray([canonical[i]["embedding"] for i in ids], dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms > 0, norms, 1.0)
+        similarity = vectors @ vectors.T
+        for j in range(1, len(ids)):
+            # Earliest surviving node it matches becomes its canonical
+            for i in np.flatnonzero(similarity[j, :j] >= DEDUP_SIMILARITY):
+                if ids[i] not in alias:
+                    alias[ids[j]] = ids[i]
+                    break
+    for dup_id in alias:
+        canonical.pop(dup_id, None)
+    return list(canonical.values()), alias
+
 
 class GraphClient:
+    # Rows per UNWIND statement in sync_graph
+    SYNC_BATCH_SIZE = 1000
+    # Variable-length bounds can't be parameters, so hops are validated and inlined
+    MAX_NEIGHBOR_HOPS = 5
+    NEIGHBOR_LIMIT = 500
+    MAX_CONNECTION_POOL_SIZE = 50
+    CONNECTION_ACQUISITION_TIMEOUT_SECONDS = 30.0
+
     def __init__(self, uri: Optional[str] = None, user: Optional[str] = None, password: Optional[str] = None):
         self.uri = uri or os.getenv("NEO4J_URI", "bolt://localhost:7687")
         self.user = user or os.getenv("NEO4J_USER", "neo4j")
         self.password = password or os.getenv("NEO4J_PASSWORD", "password")
-        self._driver = GraphDatabase.driver(self.uri, auth=(self.user, self.password))
+        self._driver = GraphDatabase.driver(
+            self.uri,
+            auth=(self.user, self.password),
+            max_connection_pool_size=self.MAX_CONNECTION_POOL_SIZE,
+            connection_acquisition_timeout=self.CONNECTION_ACQUISITION_TIMEOUT_SECONDS,
+            keep_alive=True,
+        )
+        # Shared by every session so reads after a write are causally consistent on a cluster
+        self._bookmarks = GraphDatabase.bookmark_manager()
+        self._apoc: Optional[bool] = None  # probed on first neighbor query
 
     def close(self):
         self._driver.close()
 
-    def sync_graph(self, graph_data: JsonDict) -> None:
-        nodes: List[JsonDict] = graph_data.get("nodes", [])
-        edges: List[JsonDict] = graph_data.get("edges", [])
-        logger.info(f"Syncing graph to Neo4j nodes={len(nodes)} edges={len(edges)}")
-
-        with self._driver.session() as session:
-            session.run("CREATE CONSTRAINT IF NOT EXISTS FOR (n:Node) REQUIRE n.id IS UNIQUE")
-            # Upsert nodes
-            for n in nodes:
-                session.run(
-                    """
-                    MERGE (node:Node {id: $id})
-                    SET node += $props
-                    """,
-                    id=n["id"],
-                    props={
-                        "label": n.get("label"),
-                        "title": n.get("title"),
-                        "group": n.get("group"),
-                    },
-                )
-            # Upsert relationships
-            for e in edges:
-                session.run(
-                    """
-                    MATCH (a:Node {id: $from})
-                    MATCH (b:Node {id: $to})
-                    MERGE (a)-[r:REL {type: $type}]->(b)
-                    SET r += $props
-                    """,
-                    **{
-                        "from": e["from"],
-                        "to": e["to"],
-                        "type": e.get("label", "REL"),
-                        "props": {
-                            "arrows": e.get("arrows"),
-                            "width": e.get("width"),
-                            "confidence": e.get("confidence"),
-                            "title": e.get("title"),
-                        },
-                    },
-                )
-
-    def query_neighbors(self, node_id: str, max_hops: int = 2) -> List[JsonDict]:
-        with self._driver.session() as session:
-            result = session.run(
+    @contextmanager
+    def session(self, write: bool = False) -> Iterator[Any]:
+        """Session to share across several queries serving the same request."""
+        with self._driver.session(default_access_mode=WRITE_ACCESS if write else READ_ACCESS,
+                                  bookmark_manager=self._bookmarks) as session:
+            yield session
+
+    def bulk(self):
+        """Write session for batching several syncs; pass it to sync_graph(session=...)."""
+        return self.session(write=True)
+
+    def _has_apoc(self, session) -> bool:
+        if self._apoc is None:
+            try:
+                session.run("RETURN apoc.version() AS version").consume()
+                self._apoc = True
+            except ClientError:
+                self._apoc = False
+            logger.info("Neo4j APOC available: {}", self._apoc)
+        return self._apoc
+
+    def sync_graph(self, graph_data: JsonDict, session=None) -> None:
+        nodes, alias = dedupe_nodes(graph_data.get("nodes", []))
+        # Point edges at canonical nodes; ones that collapse onto a single node are dropped
+        edges = [
+            e for e in graph_data.get("edges", [])
+            if alias.get(e["from"], e["from"]) != alias.get(e["to"], e["to"])
+        ]
+        logger.info(f"Syncing graph to Neo4j nodes={len(nodes)} edges={len(edges)} merged_duplicates={len(alias)}")
+
+        merged_ids: Dict[str, List[str]] = {}
+        for dup_id, canonical_id in alias.items():
+            merged_ids.setdefault(canonical_id, []).append(dup_id)
+        node_rows = []
+        for n in nodes:
+            props = {"label": n.get("label"), "title": n.get("title"), "group": n.get("group")}
+            if n["id"] in merged_ids:
+                # Provenance: extractor ids folded into this node
+                props["merged_ids"] = merged_ids[n["id"]]
+            node_rows.append({"id": n["id"], "props": props})
+        edge_rows = [
+            {
+                "from": alias.get(e["from"], e["from"]),
+                "to": alias.get(e["to"], e["to"]),
+                "type": e.get("label", "REL"),
+                "props": {
+                    "arrows": e.get("arrows"),
+                    "width": e.get("width"),
+                    "confidence": e.get("confidence"),
+                    "title": e.get("title"),
+                },
+            }
+            for e in edges
+        ]
+
+        if session is None:
+            with self.bulk() as session:
+                self._sync_rows(session, node_rows, edge_rows)
+        else:
+            self._sync_rows(session, node_rows, edge_rows)
+
+    def _sync_rows(self, session, node_rows: List[JsonDict], edge_rows: List[JsonDict]) -> None:
+        session.run("CREATE CONSTRAINT IF NOT EXISTS FOR (n:Node) REQUIRE n.id IS UNIQUE")
+        session.run("CREATE INDEX IF NOT EXISTS FOR (n:Node) ON (n.label)")
+        # One round-trip and one commit per batch instead of per row;
+        # nodes go first so the edge MATCHes find them
+        for start in range(0, len(node_rows), self.SYNC_BATCH_SIZE):
+            session.execute_write(self._merge_nodes, node_rows[start:start + self.SYNC_BATCH_SIZE])
+        for start in range(0, len(edge_rows), self.SYNC_BATCH_SIZE):
+            session.execute_write(self._merge_edges, edge_rows[start:start + self.SYNC_BATCH_SIZE])
+
+    @staticmethod
+    def _merge_nodes(tx, rows: List[JsonDict]) -> None:
+        tx.run(
+            """
+            UNWIND $rows AS row
+            MERGE (node:Node {id: row.id})
+            SET node += row.props
+            """,
+            rows=rows,
+        )
+
+    @staticmethod
+    def _merge_edges(tx, rows: List[JsonDict]) -> None:
+        tx.run(
+            """
+            UNWIND $rows AS row
+            MATCH (a:Node {id: row.from})
+            MATCH (b:Node {id: row.to})
+            MERGE (a)-[r:REL {type: row.type}]->(b)
+            SET r += row.props
+            """,
+            rows=rows,
+        )
+
+    def query_neighbors(self, node_id: str, max_hops: int = 2, limit: int = NEIGHBOR_LIMIT,
+                        session=None) -> List[JsonDict]:
+        if not 1 <= max_hops <= self.MAX_NEIGHBOR_HOPS:
+            raise ValueError(f"max_hops must be between 1 and {self.MAX_NEIGHBOR_HOPS}, got {max_hops}")
+        if session is None:
+            with self.session() as session:
+                return self.query_neighbors(node_id, max_hops, limit, session=session)
+        if self._has_apoc(session):
+            # APOC's BFS visits each node once instead of expanding every path
+            query = """
+                MATCH (n:Node {id: $node_id})
+                CALL apoc.path.subgraphNodes(n, {maxLevel: $max_hops, relationshipFilter: 'REL',
+                                                 uniqueness: 'NODE_GLOBAL', minLevel: 1})
+                YIELD node
+                RETURN node.id AS node_id
+                LIMIT $limit
                 """
-                MATCH (n:Node {id: $node_id})-[r*1..$max_hops]-(m)
+        else:
+            query = f"""
+                MATCH (n:Node {{id: $node_id}})-[*1..{max_hops}]-(m)
                 RETURN DISTINCT m.id AS node_id
-                """,
-                node_id=node_id,
-                max_hops=max_hops,
-            )
-            return [{"node_id": rec["node_id"]} for rec in result]
+                LIMIT $limit
+                """
+        records = session.execute_read(self._read, query, node_id=node_id, max_hops=max_hops, limit=limit)
+        return [{"node_id": rec["node_id"]} for rec in records]
+
+    def query_neighbors_batch(self, node_ids: List[str], max_hops: int = 2, limit: int = NEIGHBOR_LIMIT,
+                              session=None) -> Dict[str, List[JsonDict]]:
+        """Neighbors of several nodes in one UNWIND query, keyed by node id (unknown ids map to [])."""
+        if not 1 <= max_hops <= self.MAX_NEIGHBOR_HOPS:
+            raise ValueError(f"max_hops must be between 1 and {self.MAX_NEIGHBOR_HOPS}, got {max_hops}")
+        ids = list(dict.fromkeys(node_ids))
+        if not ids:
+            return {}
+        if session is None:
+            with self.session() as session:
+                return self.query_neighbors_batch(ids, max_hops, limit, session=session)
+        if self._has_apoc(session):
+            query = """
+                UNWIND $ids AS id
+                MATCH (n:Node {id: id})
+                CALL apoc.path.subgraphNodes(n, {maxLevel: $max_hops, relationshipFilter: 'REL',
+                                                 uniqueness: 'NODE_GLOBAL', minLevel: 1})
+                YIELD node
+                WITH id, collect(node.id)[..$limit] AS neighbors
+                RETURN id, neighbors
+                """
+        else:
+            query = f"""
+                UNWIND $ids AS id
+                MATCH (n:Node {{id: id}})-[*1..{max_hops}]-(m)
+                WITH id, collect(DISTINCT m.id)[..$limit] AS neighbors
+                RETURN id, neighbors
+                """
+        records = session.execute_read(self._read, query, ids=ids, max_hops=max_hops, limit=limit)
+        neighbors: Dict[str, List[JsonDict]] = {node_id: [] for node_id in ids}
+        for rec in records:
+            neighbors[rec["id"]] = [{"node_id": m} for m in rec["neighbors"]]
+        return neighbors
 
     def find_by_label(self, label: str) -> List[JsonDict]:
-        with self._driver.session() as session:
-            result = session.run(
+        with self.session() as session:
+            records = session.execute_read(
+                self._read,
                 """
                 MATCH (n:Node {label: $label})
                 RETURN n.id AS id, n.title AS title, n.group AS group
                 """,
                 label=label,
             )
-            return [{"id": r["id"], "title": r["title"], "group": r["group"]} for r in result]
\ No newline at end of file
+        return [{"id": r["id"], "title": r["title"], "group": r["group"]} for r in records]
+
+    @staticmethod
+    def _read(tx, query: str, **params) -> List[Any]:
+        # Materialize inside the transaction function so a retry re-reads cleanly
+        return list(tx.run(query, **params))
@@ -1,18 +1,76 @@
-from typing import Any, Dict, Optional
+import asyncio
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
 from datetime import datetime, timezone
 from loguru import logger
 
 JsonDict = Dict[str, Any]
 
+# Records queued by audit_async; bounded so a stalled sink cannot grow memory without limit
+AUDIT_BUFFER_SIZE = 10_000
+_buffer: Deque[JsonDict] = deque(maxlen=AUDIT_BUFFER_SIZE)
+_flusher: Optional[asyncio.Task] = None
 
-def audit_event(action: str, user_id: Optional[str] = None, actor: str = "system", details: Optional[JsonDict] = None,
-                correlation_id: Optional[str] = None) -> None:
-    evt = {
+# Bound once; lazy so the record is only rendered when a sink accepts INFO, and the
+# event lands in record["extra"]["evt"] for structured (serialize=True) sinks
+_audit_logger = logger.bind(audit=True).opt(lazy=True)
+
+
+def _build(action: str, user_id: Optional[str], actor: str, details: Optional[JsonDict],
+           correlation_id: Optional[str]) -> JsonDict:
+    return {
         "action": action,
         "user_id": user_id,
         "actor": actor,
         "details": details or {},
-        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "timestamp": time.time_ns(),  # rendered as ISO 8601 at emit time
         "correlation_id": correlation_id
     }
-    logger.bind(audit=True).info(f"AUDIT {evt}")
\ No newline at end of file
+
+
+def _render(evt: JsonDict) -> JsonDict:
+    return {**evt, "timestamp": datetime.fromtimestamp(evt["timestamp"] / 1e9, timezone.utc).isoformat()}
+
+
+def _emit(evt: JsonDict) -> None:
+    _audit_logger.info("AUDIT {evt}", evt=lambda: _render(evt))
+
+
+def _emit_batch(batch: List[JsonDict]) -> None:
+    for evt in batch:
+        _emit(evt)
+
+
+def audit_event(action: str, user_id: Optional[str] = None, actor: str = "system", details: Optional[JsonDict] = None,
+                correlation_id: Optional[str] = None) -> None:
+    _emit(_build(action, user_id, actor, details, correlation_id))
+
+
+def audit_async(action: str, user_id: Optional[str] = None, actor: str = "system", details: Optional[JsonDict] = None,
+                correlation_id: Optional[str] = None) -> None:
+    """
+    Queue an audit record for a background writer instead of emitting it inline.
+
+    Must be called from a running event loop. The record is timestamped here;
+    only the sink write is deferred.
+    """
+    global _flusher
+    if len(_buffer) == AUDIT_BUFFER_SIZE:
+        logger.warning("Audit buffer full, dropping oldest record")
+    _buffer.append(_build(action, user_id, actor, details, correlation_id))
+    if _flusher is None or _flusher.done():
+        _flusher = asyncio.get_running_loop().create_task(_flush())
+
+
+async def _flush() -> None:
+    while _buffer:
+        batch = list(_buffer)
+        _buffer.clear()
+        await asyncio.to_thread(_emit_batch, batch)
+
+
+async def flush_audit() -> None:
+    """Wait until every record queued by audit_async has been written."""
+    while _flusher is not None and not _flusher.done():
+        await asyncio.shield(_flusher)
@@ -1,34 +1,96 @@
-from typing import Dict, Any, Optional
+import time
+import weakref
+from collections import defaultdict
+from typing import Callable, Dict, Any, Optional
 from datetime import datetime, timezone
 
+from common.ttl_cache import TTLCache
+
 JsonDict = Dict[str, Any]
 
 
 class ConsentStore:
     def __init__(self):
-        self._store: Dict[str, Dict[str, JsonDict]] = {}
+        # In-process only: multi-worker deployments each hold their own copy
+        self._store: Dict[str, Dict[str, JsonDict]] = defaultdict(dict)
+        # Bound methods held weakly, so a discarded agent's cache drops out on its own
+        self._listeners: list[weakref.WeakMethod] = []
+
+    def add_listener(self, listener: Callable[[str, str], None]) -> None:
+        """Register a bound method invoked with (user_id, purpose) whenever consent changes."""
+        self._listeners.append(weakref.WeakMethod(listener))
+
+    def remove_listener(self, listener: Callable[[str, str], None]) -> None:
+        self._listeners = [ref for ref in self._listeners if ref() not in (None, listener)]
+
+    def _notify(self, user_id: str, purpose: str) -> None:
+        live = []
+        for ref in self._listeners:
+            listener = ref()
+            if listener is not None:
+                listener(user_id, purpose)
+                live.append(ref)
+        self._listeners = live
+
+    @staticmethod
+    def _parse_expiry(expires_at: Optional[str]) -> Optional[float]:
+        if not expires_at:
+            return None
+        parsed = datetime.fromisoformat(expires_at)
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
 
     def grant(self, user_id: str, purpose: str, scope: str, expires_at: Optional[str] = None) -> None:
-        self._store.setdefault(user_id, {})
+        # Expiry is parsed once here so check() only compares floats
         self._store[user_id][purpose] = {
             "scope": scope,
-            "granted_at": datetime.now(timezone.utc).isoformat(),
-            "expires_at": expires_at,
+            "granted_at_ts": time.time(),
+            "expires_at_ts": self._parse_expiry(expires_at),
         }
+        self._notify(user_id, purpose)
 
     def revoke(self, user_id: str, purpose: str) -> None:
         if user_id in self._store and purpose in self._store[user_id]:
             del self._store[user_id][purpose]
+        self._notify(user_id, purpose)
 
     def check(self, user_id: str, purpose: str) -> bool:
-        purposes = self._store.get(user_id, {})
-        record = purposes.get(purpose)
-        if not record:
-            return False
-        expires_at = record.get("expires_at")
-        if expires_at and datetime.fromisoformat(expires_at) <= datetime.now(timezone.utc):
+        purposes = self._store.get(user_id)
+        record = purposes.get(purpose) if purposes else None
+        if record is None:
             return False
-        return True
+        expires_at_ts = record["expires_at_ts"]
+        return expires_at_ts is None or expires_at_ts > time.time()
+
+
+class ConsentCache(TTLCache):
+    """
+    Short-lived memo of ConsentStore.check results keyed by (user_id, purpose).
+
+    Entries expire after ttl_seconds; local grant/revoke calls invalidate
+    immediately via the store's listener hook.
+    """
+
+    def __init__(self, store: ConsentStore, ttl_seconds: float = 60.0, maxsize: int = 100_000):
+        super().__init__(maxsize, ttl_seconds)
+        self.store = store
+        store.add_listener(self.invalidate)
+
+    def check(self, user_id: str, purpose: str) -> bool:
+        key = (user_id, purpose)
+        allowed = self.get(key)
+        if allowed is None:
+            allowed = self.store.check(user_id, purpose)
+            self.set(key, allowed)
+        return allowed
+
+    def invalidate(self, user_id: str, purpose: Optional[str] = None) -> None:
+        if purpose is not None:
+            self.pop((user_id, purpose))
+            return
+        for key in [k for k in self.keys() if k[0] == user_id]:
+            self.pop(key)
 
 
 consent_store = ConsentStore()
\ No newline at end of file
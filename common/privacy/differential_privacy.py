@@ -1,23 +1,32 @@
-import math
-import random
 from typing import List, Dict, Any, Optional
 
+import numpy as np
+
 JsonDict = Dict[str, Any]
 
 
 class DifferentialPrivacy:
-    def __init__(self, epsilon: float = 1.0, delta: float = 1e-5):
+    def __init__(self, epsilon: float = 1.0, delta: float = 1e-5, seed: Optional[int] = None):
         self.epsilon = epsilon
         self.delta = delta
+        # One generator for scalar and vector noise, so a seed reproduces both
+        self._rng = np.random.default_rng(seed)
 
     def _laplace(self, scale: float) -> float:
-        u = random.uniform(-0.5, 0.5)
-        return -scale * math.copysign(1.0, u) * math.log(1 - 2 * abs(u))
+        return float(self._rng.laplace(0.0, scale))
 
     def add_laplace_noise(self, value: float, sensitivity: float = 1.0) -> float:
         scale = sensitivity / self.epsilon
         return float(value + self._laplace(scale))
 
+    def add_laplace_noise_vec(self, values: np.ndarray, sensitivity: float = 1.0) -> np.ndarray:
+        # Matches FLAggregator's dp_hook signature: noise the whole weight vector in one call
+        values = np.asarray(values, dtype=np.float64)
+        # Add into the freshly drawn noise array rather than allocating a third one
+        noise = self._rng.laplace(0.0, sensitivity / self.epsilon, size=values.shape)
+        noise += values
+        return noise
+
     def dp_count(self, n: int) -> float:
         return self.add_laplace_noise(n, sensitivity=1.0)
 
@@ -33,7 +42,6 @@ def dp_aggregate_summary(values: List[float], epsilon: float = 0.8) -> JsonDict:
     dp = DifferentialPrivacy(epsilon=epsilon)
     if not values:
         return {"count": 0, "mean": 0.0}
-    return {
-        "count": dp.dp_count(len(values)),
-        "mean": dp.dp_mean(values, sensitivity=1.0),
-    }
\ No newline at end of file
+    # Count and mean both have sensitivity 1, so draw their noise together
+    count, mean = dp.add_laplace_noise_vec(np.array([len(values), np.mean(values)]), sensitivity=1.0)
+    return {"count": float(count), "mean": float(mean)}
@@ -1,9 +1,31 @@
-from typing import List, Dict, Any, Callable
+import os
+from typing import List, Dict, Any, Callable, Optional
+import numpy as np
 from loguru import logger
 
+try:  # optional GPU backend for large model updates
+    import cupy as cp
+except ImportError:
+    cp = None
+
 JsonDict = Dict[str, Any]
 
 
+def _resolve_backend(requested: str) -> str:
+    if requested != "cupy":
+        return "numpy"
+    if cp is None:
+        logger.warning("FL_BACKEND=cupy but CuPy is not installed; using NumPy")
+        return "numpy"
+    try:
+        if cp.cuda.runtime.getDeviceCount() > 0:
+            return "cupy"
+    except cp.cuda.runtime.CUDARuntimeError:
+        pass
+    logger.warning("FL_BACKEND=cupy but no CUDA device is available; using NumPy")
+    return "numpy"
+
+
 class FLClient:
     def __init__(self, client_id: str):
         self.client_id = client_id
@@ -18,8 +40,11 @@ class FLClient:
 
 
 class FLAggregator:
-    def __init__(self, dp_hook: Callable[[List[float]], List[float]] | None = None):
+    def __init__(self, dp_hook: Callable[[np.ndarray], np.ndarray] | None = None, backend: Optional[str] = None):
+        # dp_hook receives and returns the averaged weights as a float64 (host) array
         self.dp_hook = dp_hook
+        # "numpy" (default) or "cupy"; falls back to NumPy without a usable GPU
+        self.backend = _resolve_backend((backend or os.getenv("FL_BACKEND", "numpy")).lower())
 
     def aggregate(self, client_updates: List[JsonDict]) -> List[float]:
         # Simple FedAvg on weights
@@ -27,15 +52,20 @@ class FLAggregator:
             return []
         # Expect all clients to have same weight length; production code needs robust validation.
         weights_list = [u["weights"] for u in client_updates if "weights" in u]
-        if not weights_list or not weights_list[0]:
+        if not weights_list or not len(weights_list[0]):
             return []
-        n = len(weights_list[0])
-        avg = [0.0] * n
-        for w in weights_list:
-            for i in range(n):
-                avg[i] += w[i]
-        avg = [v / len(weights_list) for v in avg]
+        avg = self._mean(cp if self.backend == "cupy" else np, weights_list)
         if self.dp_hook:
             avg = self.dp_hook(avg)
         logger.info(f"Aggregated {len(client_updates)} client updates")
-        return avg
\ No newline at end of file
+        return avg.tolist()
+
+    @staticmethod
+    def _mean(xp: Any, weights_list: List[Any]) -> np.ndarray:
+        # Running float64 sum over float32 client copies, divided in place: one pass per
+        # client and no (clients x weights) stack. xp is numpy or cupy; the result is on the host.
+        total = xp.zeros(len(weights_list[0]), dtype=xp.float64)
+        for w in weights_list:
+            xp.add(total, xp.asarray(np.asarray(w, dtype=np.float32)), out=total)
+        total /= len(weights_list)
+        return total if xp is np else cp.asnumpy(total)
@@ -1,31 +1,85 @@
-from typing import List, Dict, Any, Optional
+import hashlib
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
 from loguru import logger
 
 from common.persistence.vector_client import VectorClient
 from common.persistence.graph_client import GraphClient
+from common.ttl_cache import TTLCache
 
 JsonDict = Dict[str, Any]
 
 
 class HybridRetriever:
-    def __init__(self, vector_client: VectorClient, graph_client: GraphClient):
+    def __init__(self, vector_client: VectorClient, graph_client: GraphClient,
+                 cache_ttl_seconds: float = 300.0, cache_size: int = 2048):
         self.vec = vector_client
         self.graph = graph_client
+        # Recent results keyed by (namespace, embedding digest, graph node, k); size 0 disables
+        self._cache = TTLCache(cache_size, cache_ttl_seconds) if cache_size > 0 else None
+
+    @staticmethod
+    def _key(namespace: str, embedding: List[float], graph_node_id: Optional[str], k: int) -> Tuple[Any, ...]:
+        digest = hashlib.blake2b(np.asarray(embedding, dtype=np.float32).tobytes(), digest_size=16).digest()
+        return (namespace, digest, graph_node_id, k)
 
     def retrieve(self, namespace: str, embedding: List[float], graph_node_id: Optional[str] = None, k: int = 5) -> List[JsonDict]:
+        if self._cache is None:
+            return self._retrieve(namespace, embedding, graph_node_id, k)
+        key = self._key(namespace, embedding, graph_node_id, k)
+        unique = self._cache.get(key)
+        if unique is None:
+            unique = self._retrieve(namespace, embedding, graph_node_id, k)
+            self._cache.set(key, unique)
+        return list(unique)
+
+    def retrieve_batch(self, namespace: str, embeddings: List[List[float]],
+                       graph_node_ids: Optional[List[Optional[str]]] = None, k: int = 5) -> List[List[JsonDict]]:
+        """
+        Retrieve for several queries (e.g. HyDE or multi-vector variants of one turn) at once.
+
+        graph_node_ids, if given, is aligned with embeddings. Uncached queries cost one
+        vector round-trip and at most one graph round-trip in total.
+        """
+        node_ids = list(graph_node_ids) if graph_node_ids is not None else [None] * len(embeddings)
+        if len(node_ids) != len(embeddings):
+            raise ValueError("graph_node_ids must align with embeddings")
+        results: List[Optional[List[JsonDict]]] = [None] * len(embeddings)
+        keys = [self._key(namespace, e, n, k) for e, n in zip(embeddings, node_ids)] if self._cache is not None else []
+        for i, key in enumerate(keys):
+            cached = self._cache.get(key)
+            results[i] = list(cached) if cached is not None else None
+        misses = [i for i, hits in enumerate(results) if hits is None]
+        if not misses:
+            return results
+        vector_hits = self.vec.search_batch(namespace, [embeddings[i] for i in misses], k=k)
+        wanted = [node_ids[i] for i in misses if node_ids[i]]
+        neighbors = self.graph.query_neighbors_batch(wanted, max_hops=2, limit=k) if wanted else {}
+        for i, hits in zip(misses, vector_hits):
+            unique = self._merge(hits, neighbors.get(node_ids[i], []) if node_ids[i] else [], k)
+            if self._cache is not None:
+                self._cache.set(keys[i], unique)
+            results[i] = list(unique)
+        logger.debug("HybridRetriever batch of {} queries, {} uncached", len(embeddings), len(misses))
+        return results
+
+    def _retrieve(self, namespace: str, embedding: List[float], graph_node_id: Optional[str], k: int) -> List[JsonDict]:
         vector_hits = self.vec.search(namespace, embedding, k=k)
-        graph_hits: List[JsonDict] = []
-        if graph_node_id:
-            neighbors = self.graph.query_neighbors(graph_node_id, max_hops=2)
-            graph_hits = [{"id": n["node_id"], "content": f"Graph node {n['node_id']}", "score": 0.5, "metadata": {"source": "graph"}} for n in neighbors[:k]]
-        # Combine and de-duplicate
-        combined = vector_hits + graph_hits
-        seen = set()
-        unique = []
-        for hit in combined:
+        neighbors = self.graph.query_neighbors(graph_node_id, max_hops=2, limit=k) if graph_node_id else []
+        unique = self._merge(vector_hits, neighbors, k)
+        logger.debug("HybridRetriever returned {} results", len(unique))
+        return unique
+
+    @staticmethod
+    def _merge(vector_hits: List[JsonDict], neighbors: List[JsonDict], k: int) -> List[JsonDict]:
+        graph_hits = [{"id": n["node_id"], "content": f"Graph node {n['node_id']}", "score": 0.5, "metadata": {"source": "graph"}} for n in neighbors[:k]]
+        # Single-pass de-duplication: each id keeps its first position but the best-scored copy
+        merged: Dict[str, JsonDict] = {}
+        for hit in vector_hits + graph_hits:
             hid = hit.get("id") or hit.get("metadata", {}).get("id")
-            if hid and hid not in seen:
-                seen.add(hid)
-                unique.append(hit)
-        logger.debug(f"HybridRetriever returned {len(unique)} results")
-        return unique
\ No newline at end of file
+            if not hid:
+                continue
+            prev = merged.get(hid)
+            if prev is None or hit.get("score", 0.0) > prev.get("score", 0.0):
+                merged[hid] = hit
+        return list(merged.values())
@@ -0,0 +1,82 @@
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+import numpy as np
+
+
+class SimilarityCache:
+    """
+    Bounded cache of query-vector results matched by cosine similarity rather than equality.
+
+    A lookup hits when a live entry in the same partition (e.g. namespace + k) lies within
+    max_distance cosine distance of the query; distance_by_key overrides the threshold for
+    the group threshold_key(partition) maps to. Vectors live in one preallocated matrix used
+    as a ring buffer, so a lookup is a single matrix-vector product and the oldest entry is
+    overwritten when full. Entries expire ttl_seconds after being set. Locked, since
+    callers search from worker threads.
+    """
+
+    def __init__(self, maxsize: int, ttl_seconds: float, max_distance: float,
+                 distance_by_key: Optional[Dict[Hashable, float]] = None,
+                 threshold_key: Callable[[Hashable], Hashable] = lambda partition: partition):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.max_distance = max_distance
+        # Tighter thresholds for partitions (e.g. namespaces) whose recall needs it
+        self.distance_by_key = distance_by_key or {}
+        self.threshold_key = threshold_key
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.ndarray] = None  # (maxsize, dim), unit rows; allocated on first set
+        self._expires = np.zeros(maxsize, dtype=np.float64)
+        self._partitions: List[Optional[Hashable]] = [None] * maxsize
+        self._values: List[Any] = [None] * maxsize
+        self._next = 0
+
+    @staticmethod
+    def _unit(vector: List[float]) -> Optional[np.ndarray]:
+        v = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(v))
+        return v / norm if norm > 0.0 else None
+
+    def get(self, partition: Hashable, vector: List[float]) -> Optional[Any]:
+        q = self._unit(vector)
+        with self._lock:
+            if q is None or self._vectors is None or q.shape[0] != self._vectors.shape[1]:
+                return None
+            live = self._expires > time.monotonic()
+            if not live.any():
+                return None
+            similarity = self._vectors @ q
+            similarity[~live] = -np.inf
+            threshold = 1.0 - self.distance_by_key.get(self.threshold_key(partition), self.max_distance)
+            candidates = np.flatnonzero(similarity >= threshold)
+            # Closest match first; partitions are few, so most candidates share the caller's
+            for slot in candidates[np.argsort(-similarity[candidates])]:
+                if self._partitions[slot] == partition:
+                    return self._values[slot]
+            return None
+
+    def set(self, partition: Hashable, vector: List[float], value: Any) -> None:
+        q = self._unit(vector)
+        if q is None:
+            return
+        with self._lock:
+            if self._vectors is None or q.shape[0] != self._vectors.shape[1]:
+                self._vectors = np.zeros((self.maxsize, q.shape[0]), dtype=np.float32)
+                self._expires[:] = 0.0
+            slot = self._next
+            self._next = (slot + 1) % self.maxsize
+            self._vectors[slot] = q
+            self._expires[slot] = time.monotonic() + self.ttl_seconds
+            self._partitions[slot] = partition
+            self._values[slot] = value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._expires[:] = 0.0
+            self._partitions = [None] * self.maxsize
+            self._values = [None] * self.maxsize
+
+    def __len__(self) -> int:
+        return int((self._expires > time.monotonic()).sum())
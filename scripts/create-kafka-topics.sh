@@ -53,7 +53,9 @@ create_topic "ingest.wearables.raw" 8
 create_topic "ingest.wearables.standardized" 8
 create_topic "ingest.labs.raw" 4
 create_topic "ingest.labs.standardized" 4
+create_topic "ingest.labs.standardization.requested" 4
 create_topic "ingest.questionnaire.standardized" 2
+create_topic "ingest.dlq" 2
 
 # Knowledge Graph Topics (low throughput)
 create_topic "knowledge.research.import.requested" 2
@@ -66,6 +68,7 @@ create_topic "user.twin.updated" 6
 
 # Simulation Topics (medium throughput)
 create_topic "simulation.vitality.requested" 4
+create_topic "simulation.vitality.batch.requested" 2
 create_topic "simulation.vitality.completed" 4
 
 # Protocol Topics (medium throughput)
@@ -81,6 +84,7 @@ create_topic "product.recommendations" 2
 # Compliance and Audit Topics
 create_topic "compliance.alert" 2
 create_topic "audit.events" 4
+create_topic "consent.changed" 2
 
 echo ""
 echo "✅ All Kafka topics created successfully!"
@@ -0,0 +1,48 @@
+import asyncio
+import gc
+
+from agents.base import AgentConfig, BaseAgent
+from common.privacy.consent import ConsentCache, ConsentStore
+
+
+class RecordingBus:
+    def __init__(self):
+        self.subscriptions = []
+
+    async def subscribe(self, topic, handler, broadcast=False, **kwargs):
+        self.subscriptions.append((topic, "subscribe", broadcast))
+
+    async def subscribe_batch(self, topic, handler, **kwargs):
+        self.subscriptions.append((topic, "subscribe_batch", False))
+
+
+def test_consent_changes_are_consumed_by_every_instance():
+    bus = RecordingBus()
+    agent = BaseAgent(AgentConfig(name="a", subscribe_topics=["ingest.labs.raw", "consent.changed"],
+                                  batch_size=64), bus)
+    asyncio.run(agent.start())
+
+    assert sorted(bus.subscriptions) == [
+        ("consent.changed", "subscribe", True),
+        ("ingest.labs.raw", "subscribe_batch", False),
+    ]
+
+
+def test_revoke_invalidates_cached_grant():
+    store = ConsentStore()
+    cache = ConsentCache(store, ttl_seconds=60.0)
+    store.grant("u1", "data_processing", "all")
+    assert cache.check("u1", "data_processing")
+
+    store.revoke("u1", "data_processing")
+    assert not cache.check("u1", "data_processing")
+
+
+def test_discarded_cache_stops_listening():
+    store = ConsentStore()
+    cache = ConsentCache(store)
+    del cache
+    gc.collect()
+
+    store.grant("u1", "data_processing", "all")
+    assert store._listeners == []
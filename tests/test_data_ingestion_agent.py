@@ -0,0 +1,103 @@
+import asyncio
+
+import agents.data_ingestion_agent as ingestion
+from common.event_bus import Event
+
+
+class FlakyTimeseries:
+    """Stands in for TimescaleDB; the first `failures` COPY calls raise."""
+    pool_size = 2
+
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.written = []
+
+    def copy_measurements(self, rows):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("connection reset")
+        self.written.extend(rows)
+        return len(rows)
+
+
+class RecordingBus:
+    def __init__(self):
+        self.published = []
+
+    async def subscribe(self, *args, **kwargs):
+        pass
+
+    async def subscribe_batch(self, *args, **kwargs):
+        pass
+
+    async def publish(self, topic, event_type, payload, user_id=None, correlation_id=None):
+        self.published.append((topic, payload))
+        return correlation_id
+
+
+def _wearables_event(user_id: str, value: float) -> Event:
+    return Event(
+        topic="ingest.wearables.standardized",
+        type="wearables.standardized",
+        payload={"provider": "oura", "data": [{"fhir": {
+            "code": {"text": "hrv"},
+            "effectiveDateTime": "2024-01-01T00:00:00+00:00",
+            "valueQuantity": {"value": value, "unit": "ms"},
+        }}]},
+        user_id=user_id,
+    )
+
+
+def _run(failures: int, monkeypatch):
+    ts = FlakyTimeseries(failures)
+    monkeypatch.setattr(ingestion, "TimeseriesClient", lambda: ts)
+    bus = RecordingBus()
+
+    async def scenario():
+        agent = ingestion.DataIngestionAgent(bus)
+        agent.WRITE_BACKOFF_SECONDS = 0
+        await agent.start()
+        await agent.handle_batch([_wearables_event("u1", 40.0), _wearables_event("u2", 50.0)])
+        await agent.stop()
+
+    asyncio.run(scenario())
+    return ts, bus
+
+
+def test_failed_copy_is_retried_not_dropped(monkeypatch):
+    ts, bus = _run(failures=2, monkeypatch=monkeypatch)
+
+    assert sorted(m.value for m in ts.written) == [40.0, 50.0]
+    assert not [topic for topic, _ in bus.published if topic == "ingest.dlq"]
+
+
+def test_copy_failing_every_attempt_dead_letters_the_events(monkeypatch):
+    ts, bus = _run(failures=1000, monkeypatch=monkeypatch)
+
+    assert ts.written == []
+    dead = [payload["event"]["user_id"] for topic, payload in bus.published if topic == "ingest.dlq"]
+    assert sorted(dead) == ["u1", "u2"]
+
+
+def test_raw_wearables_are_republished_as_fhir_and_persisted(monkeypatch):
+    ts = FlakyTimeseries(failures=0)
+    monkeypatch.setattr(ingestion, "TimeseriesClient", lambda: ts)
+    bus = RecordingBus()
+    raw = Event(topic="ingest.wearables.raw", type="wearables.raw", user_id="u1",
+                payload={"provider": "oura", "data": [
+                    {"type": "hrv", "value": 42.5, "timestamp": "2024-01-01T00:00:00+00:00", "unit": "ms"},
+                    {"type": "steps", "value": 900, "ts": "2024-01-01T01:00:00+00:00"},
+                ]})
+
+    async def scenario():
+        agent = ingestion.DataIngestionAgent(bus)
+        await agent.start()
+        await agent.handle(raw)
+        [(topic, payload)] = bus.published
+        assert topic == "ingest.wearables.standardized"
+        await agent.handle(Event(topic=topic, type="wearables.standardized", payload=payload, user_id="u1"))
+        await agent.stop()
+
+    asyncio.run(scenario())
+
+    assert sorted((m.metric, m.value) for m in ts.written) == [("hrv", 42.5), ("steps", 900.0)]
@@ -0,0 +1,95 @@
+import asyncio
+import time
+
+import agents.digital_twin_agent as twin_agent
+from common.event_bus import Event
+
+
+class SlowTimeseries:
+    """Stands in for TimescaleDB; queries block briefly so concurrent loads overlap."""
+    pool_size = 4
+
+    def __init__(self):
+        self.rows = []
+
+    def query(self, **kwargs):
+        time.sleep(0.05)
+        return []
+
+    def insert_measurements(self, rows):
+        self.rows.extend(rows)
+        return len(rows)
+
+
+class NullBus:
+    async def subscribe(self, *args, **kwargs):
+        pass
+
+    async def subscribe_batch(self, *args, **kwargs):
+        pass
+
+    async def publish(self, *args, **kwargs):
+        return "corr"
+
+
+def _hrv_event(value: float) -> Event:
+    return Event(
+        topic="ingest.wearables.standardized",
+        type="wearables.standardized",
+        payload={"data": [{"fhir": {"code": {"text": "hrv"}, "valueQuantity": {"value": value}}}]},
+        user_id="u1",
+    )
+
+
+def test_concurrent_first_events_share_one_twin(monkeypatch):
+    monkeypatch.setattr(twin_agent, "TimeseriesClient", SlowTimeseries)
+    agent = twin_agent.DigitalTwinAgent(NullBus())
+
+    async def scenario():
+        await asyncio.gather(agent.handle(_hrv_event(60.0)), agent.handle(_hrv_event(70.0)))
+
+    asyncio.run(scenario())
+
+    twin = agent._twins["u1"]
+    # Both events updated the same twin; neither replaced the other
+    assert twin.version == 3
+    assert twin.metrics.hrv in (60.0, 70.0)
+    assert not agent._loading
+
+
+class FailingTimeseries(SlowTimeseries):
+    def __init__(self):
+        super().__init__()
+        self.fail = True
+
+    def query(self, **kwargs):
+        return []
+
+    def insert_measurements(self, rows):
+        if self.fail:
+            raise ConnectionError("connection reset")
+        return super().insert_measurements(rows)
+
+
+def test_evicted_twin_survives_failed_persist(monkeypatch):
+    monkeypatch.setattr(twin_agent, "TimeseriesClient", FailingTimeseries)
+    agent = twin_agent.DigitalTwinAgent(NullBus())
+    agent.MAX_TWINS = 1
+    agent.PERSIST_RETRY_SECONDS = 0
+
+    async def scenario():
+        await agent.start()
+        await agent.handle(_hrv_event(60.0))
+        await agent.handle(Event(topic="user.twin.update.requested", type="x", payload={}, user_id="u2"))
+        await asyncio.sleep(0.05)
+        # u1 was evicted and its snapshot failed to write; it is kept, not dropped
+        assert "u1" in agent._evicted
+        agent.ts.fail = False
+        await agent.handle(_hrv_event(70.0))
+        await agent.stop()
+
+    asyncio.run(scenario())
+
+    # The returning user resumed from the evicted state, not a fresh twin
+    assert agent._twins["u1"].version == 3
+    assert any(row["user_id"] == "u1" for row in agent.ts.rows)
@@ -0,0 +1,13 @@
+import numpy as np
+import orjson
+
+from common.event_bus import Event
+
+
+def test_numpy_values_serialize_as_numbers():
+    event = Event(topic="simulation.vitality.completed", type="simulation.completed",
+                  payload={"score": np.float64(0.5), "count": np.int64(3), "curve": np.array([0.25, 0.75])})
+
+    payload = orjson.loads(event.to_bytes())["payload"]
+
+    assert payload == {"score": 0.5, "count": 3, "curve": [0.25, 0.75]}
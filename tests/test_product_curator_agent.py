@@ -0,0 +1,68 @@
+import random
+
+import pytest
+
+import agents.product_curator_agent as curator
+from agents.product_curator_agent import Product, ProductCuratorAgent, UserHealthProfile
+
+GOALS = [f"goal{i}" for i in range(12)]
+CONDITIONS = [f"condition{i}" for i in range(6)]
+ALLERGENS = [f"allergen{i}" for i in range(4)]
+
+
+def _catalog(rnd: random.Random, size: int):
+    return [
+        Product(
+            id=f"p{i}", name=f"Product {i}", category="supplement", tags=[],
+            health_goals=rnd.sample(GOALS, rnd.randint(0, 3)),
+            contraindications=rnd.sample(CONDITIONS, rnd.randint(0, 2)),
+            allergens=rnd.sample(ALLERGENS, rnd.randint(0, 1)),
+            evidence_level=rnd.choice(["high", "moderate", "low", "unrated"]),
+            quality_score=round(rnd.random(), 2),
+        )
+        for i in range(size)
+    ]
+
+
+def _full_scan(agent: ProductCuratorAgent, profile: UserHealthProfile):
+    """Reference: check and score every product, then sort; what the pruned scan must match."""
+    ranked, excluded = [], {}
+    for pos, product in enumerate(agent.catalog):
+        is_safe, issues = agent._validate_product_safety(product, profile)
+        if not is_safe:
+            excluded[product.id] = issues
+            continue
+        score = agent._calculate_relevance_score(product, profile)
+        if score > 0.3:
+            ranked.append((round(score, 2), -pos))
+    top = sorted(ranked, reverse=True)[:agent.max_recommendations]
+    return [(agent.catalog[-neg_pos].id, score) for score, neg_pos in top], excluded, len(ranked)
+
+
+# Catalog sizes on both sides of SAFETY_INDEX_MIN_CATALOG
+@pytest.mark.parametrize("size", [40, 400])
+def test_pruned_scan_matches_full_scan(size, monkeypatch):
+    audits = []
+    monkeypatch.setattr(curator, "audit_async", lambda action, **kwargs: audits.append(kwargs["details"]))
+    rnd = random.Random(size)
+    agent = ProductCuratorAgent.__new__(ProductCuratorAgent)
+    agent.catalog = _catalog(rnd, size)
+    agent.max_recommendations = 5
+    agent._index_catalog()
+
+    for _ in range(200):
+        profile = UserHealthProfile(
+            "u1",
+            health_conditions=rnd.sample(CONDITIONS, rnd.randint(0, 3)),
+            allergies=rnd.sample(ALLERGENS, rnd.randint(0, 2)),
+            health_goals=rnd.sample(GOALS, rnd.randint(0, 4)),
+        )
+        recommendations = agent._generate_personalized_recommendations(profile)
+        expected, excluded, recommended_count = _full_scan(agent, profile)
+
+        assert [(r["id"], r["score"]) for r in recommendations] == expected
+        # The safety audit still describes the whole catalog
+        audit = audits.pop()
+        assert audit["excluded_products"] == excluded
+        assert audit["excluded_count"] == len(excluded)
+        assert audit["recommended_count"] == recommended_count
@@ -0,0 +1,42 @@
+from fastapi.testclient import TestClient
+
+from api import simple_service
+from api.simple_service import app, simulation_results
+from common.ttl_cache import TTLCache
+
+client = TestClient(app)
+
+
+def test_batch_scenarios_for_one_user_get_distinct_correlation_ids():
+    simulation_results.clear()
+    response = client.post("/simulation/vitality/batch", json={"scenarios": [
+        {"user_id": "u1", "sleep_minutes_delta": 30},
+        {"user_id": "u1", "activity_minutes_delta": 45},
+    ]})
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    ids = [r["correlation_id"] for r in results]
+    assert len(set(ids)) == 2
+    # Both scenarios are kept, each under its own id
+    assert all(simulation_results.get(cid) == result for cid, result in zip(ids, results))
+
+
+def test_single_and_batch_endpoints_agree():
+    scenario = {"user_id": "u1", "sleep_minutes_delta": 45, "activity_minutes_delta": -20,
+                "stress_reduction": 0.4, "current_vitality": 0.55}
+
+    single = client.post("/simulation/vitality", json=scenario).json()["results"]
+    [batched] = client.post("/simulation/vitality/batch", json={"scenarios": [scenario]}).json()["results"]
+
+    for key in ("predicted_vitality", "improvement", "estimated_changes"):
+        assert single[key] == batched[key]
+
+
+def test_stored_results_are_bounded(monkeypatch):
+    results = TTLCache(maxsize=100, ttl_seconds=60.0)
+    monkeypatch.setattr(simple_service, "simulation_results", results)
+
+    client.post("/simulation/vitality/batch", json={"scenarios": [{"user_id": "u1"}] * 1000})
+
+    assert len(results) == 100
@@ -0,0 +1,17 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from common.ttl_cache import TTLCache
+
+
+def test_concurrent_sets_from_worker_threads_stay_bounded():
+    cache = TTLCache(maxsize=64, ttl_seconds=60.0)
+
+    def fill(worker: int) -> None:
+        for i in range(5000):
+            cache.set((worker, i), i)
+            cache.get((worker, i - 1))
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(fill, range(8)))
+
+    assert len(cache) == 64
@@ -0,0 +1,42 @@
+import asyncio
+
+from agents.vitality_simulation_agent import VitalitySimulationAgent
+from common.event_bus import Event
+
+
+class RecordingBus:
+    def __init__(self):
+        self.published = []
+
+    async def publish(self, topic, event_type, payload, user_id=None, correlation_id=None):
+        self.published.append((event_type, payload))
+        return correlation_id
+
+
+def _batch(payload):
+    bus = RecordingBus()
+    agent = VitalitySimulationAgent(bus)
+    event = Event(topic="simulation.vitality.batch.requested", type="simulation.batch.request",
+                  payload=payload, user_id="u1", correlation_id="c1")
+    asyncio.run(agent.handle(event))
+    return bus.published
+
+
+def test_batch_broadcasts_single_element_lists():
+    [(event_type, payload)] = _batch({"sleep_minutes_delta": [0, 30, 60], "stress_reduction": [0.5]})
+
+    assert event_type == "simulation.batch.completed"
+    assert [s["sleep_minutes_delta"] for s in payload["scenarios"]] == [0, 30, 60]
+
+
+def test_batch_with_mismatched_lengths_is_rejected():
+    [(event_type, payload)] = _batch({"sleep_minutes_delta": [0, 30], "activity_minutes_delta": [0, 30, 60]})
+
+    assert event_type == "simulation.batch.failed"
+    assert "equal length" in payload["error"]
+
+
+def test_batch_out_of_range_is_rejected():
+    [(event_type, _)] = _batch({"stress_reduction": [0.2, 1.5]})
+
+    assert event_type == "simulation.batch.failed"